@@ -1,5 +1,7 @@
+import sqlalchemy
 import sqlalchemy.orm as orm
 import database
+from datetime import datetime, timezone
 
 
 class User(database.Base):
@@ -16,4 +18,18 @@ class EmailToken(database.Base):
 
     id: orm.Mapped[int] = orm.mapped_column(primary_key=True)
     username: orm.Mapped[str] = orm.mapped_column(default=True)
-    email_token: orm.Mapped[str]
\ No newline at end of file
+    email_token: orm.Mapped[str]
+
+class EmailOutbox(database.Base):
+    __tablename__ = 'email_outbox'
+    __table_args__ = (sqlalchemy.Index('ix_email_outbox_due', 'status', 'next_attempt_at'),)
+
+    id: orm.Mapped[int] = orm.mapped_column(primary_key=True)
+    recipient: orm.Mapped[str]
+    email_token: orm.Mapped[str]
+    status: orm.Mapped[str] = orm.mapped_column(default='pending')  # pending | sent | failed
+    attempts: orm.Mapped[int] = orm.mapped_column(default=0)
+    next_attempt_at: orm.Mapped[datetime] = orm.mapped_column(
+        sqlalchemy.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+    last_error: orm.Mapped[str | None] = orm.mapped_column(default=None)
@@ -0,0 +1,225 @@
+"""
+Worker sending the verification emails queued in `email_outbox`.
+
+Runs as its own process so API workers never talk to the SMTP server:
+
+    python -m auth.outbox [--batch-size 50] [--poll-interval 2]
+
+SMTP settings come from the environment: SMTP_HOST, SMTP_PORT, SMTP_SSL,
+SENDER and PASSWORD.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import smtplib
+from datetime import datetime, timedelta, timezone
+from email.mime.text import MIMEText
+import sqlalchemy
+from dotenv import load_dotenv
+from jinja2 import Environment, FileSystemLoader
+import database
+import auth.models
+
+# The environment caches compiled templates, so each is parsed once per process
+templates = Environment(
+    loader=FileSystemLoader(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')),
+    autoescape=True,
+)
+
+SUBJECT = 'Hello from Python'
+MAX_BACKOFF = 3600
+
+
+def render_verification_email(sender: str, recipient: str, email_token: str) -> str:
+    """
+    Render the verification email for a recipient.
+
+    Args:
+        sender (str): Address in the From header.
+        recipient (str): Address in the To header.
+        email_token (str): Token embedded in the verification link.
+
+    Returns:
+        str: The MIME message ready for `sendmail`.
+    """
+    html = templates.get_template('verifie_email.html').render(email_token=email_token)
+    message = MIMEText(html, 'html')
+    message['Subject'] = SUBJECT
+    message['From'] = sender
+    message['To'] = recipient
+    return message.as_string()
+
+
+class SMTPConnection:
+    """
+    SMTP session kept open across batches and reopened when it breaks.
+    """
+
+    def __init__(self, host: str, port: int, use_ssl: bool = True, username: str | None = None,
+                 password: str | None = None, timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self._server = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            host=os.environ.get('SMTP_HOST', 'smtp.gmail.com'),
+            port=int(os.environ.get('SMTP_PORT', 465)),
+            use_ssl=os.environ.get('SMTP_SSL', 'true').lower() in ('1', 'true', 'yes', 'on'),
+            username=os.environ.get('SENDER'),
+            password=os.environ.get('PASSWORD'),
+        )
+
+    def _connect(self):
+        server_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        server = server_class(self.host, self.port, timeout=self.timeout)
+        if self.password:
+            server.login(self.username, self.password)
+        self._server = server
+
+    def send(self, sender: str, recipient: str, message: str):
+        if self._server is None:
+            self._connect()
+        try:
+            self._server.sendmail(sender, recipient, message)
+        except smtplib.SMTPServerDisconnected:
+            # Idle connections get dropped by the server, retry once on a fresh one
+            self._connect()
+            self._server.sendmail(sender, recipient, message)
+
+    def send_batch(self, sender: str, messages: list) -> list:
+        """
+        Send `(recipient, message)` pairs over the open connection.
+
+        Returns:
+            list: None for each delivered message, otherwise the error text.
+        """
+        errors = []
+        for recipient, message in messages:
+            try:
+                self.send(sender, recipient, message)
+                errors.append(None)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError) as error:
+                errors.append(str(error))
+            except (smtplib.SMTPException, OSError) as error:
+                errors.append(str(error) or type(error).__name__)
+                self.close()
+        return errors
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+
+class OutboxWorker:
+    """
+    Drains due outbox messages in batches, retrying failures with exponential backoff.
+
+    Batches are claimed with `FOR UPDATE SKIP LOCKED` where the database
+    supports it, so several workers can run side by side.
+    """
+
+    def __init__(self, smtp: SMTPConnection, sender: str, session_factory=None, batch_size: int = 50,
+                 poll_interval: float = 2.0, max_attempts: int = 8, backoff: float = 30.0):
+        self.smtp = smtp
+        self.sender = sender
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+
+    async def drain_once(self) -> int:
+        """
+        Send one batch of due messages.
+
+        Returns:
+            int: Number of messages attempted.
+        """
+        outbox = auth.models.EmailOutbox
+        now = datetime.now(timezone.utc)
+        session_factory = self.session_factory or database.DBsession
+
+        async with session_factory() as db:
+            batch = (await db.scalars(
+                sqlalchemy.select(outbox)
+                .where(outbox.status == 'pending', outbox.next_attempt_at <= now)
+                .order_by(outbox.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )).all()
+            if not batch:
+                return 0
+
+            messages = [
+                (message.recipient, render_verification_email(self.sender, message.recipient, message.email_token))
+                for message in batch
+            ]
+            errors = await asyncio.to_thread(self.smtp.send_batch, self.sender, messages)
+
+            for message, error in zip(batch, errors):
+                message.attempts += 1
+                message.last_error = error
+                if error is None:
+                    message.status = 'sent'
+                elif message.attempts >= self.max_attempts:
+                    message.status = 'failed'
+                else:
+                    delay = min(self.backoff * 2 ** (message.attempts - 1), MAX_BACKOFF)
+                    message.next_attempt_at = now + timedelta(seconds=delay)
+            await db.commit()
+            return len(batch)
+
+    async def run(self, stop: asyncio.Event):
+        """
+        Drain the outbox until `stop` is set, idling `poll_interval` when it is empty.
+        """
+        try:
+            while not stop.is_set():
+                if await self.drain_once() < self.batch_size:
+                    try:
+                        await asyncio.wait_for(stop.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            await asyncio.to_thread(self.smtp.close)
+
+
+async def main(args):
+    load_dotenv()
+    os.environ.setdefault('DB_SCHEMA', 'none')
+    os.environ.setdefault('DB_POOL_WARMUP', '1')
+    await database.connect()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    worker = OutboxWorker(
+        smtp=SMTPConnection.from_env(),
+        sender=os.environ.get('SENDER'),
+        batch_size=args.batch_size,
+        poll_interval=args.poll_interval,
+    )
+    try:
+        await worker.run(stop)
+    finally:
+        await database.disconnect()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Send queued verification emails.')
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--poll-interval', type=float, default=2.0)
+    asyncio.run(main(parser.parse_args()))
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status
+import sqlalchemy
 import database
 import auth.schemas
 import auth.models
@@ -22,15 +23,17 @@ router_debug = APIRouter(
 @router.post("", status_code=status.HTTP_201_CREATED)
 async def create_user(
     user: auth.schemas.User,
-    background_tasks: BackgroundTasks,
     db=Depends(database.get_db)
 ):
     """
-    Create a new user.
+    Create a new user and queue their verification email.
+
+    The user is inserted with INSERT ... ON CONFLICT DO NOTHING, so a taken
+    username is detected by the insert itself instead of a prior SELECT that
+    a concurrent signup could race.
 
     Args:
         user (auth.schemas.User): The user details to be created.
-        background_tasks (BackgroundTasks): FastAPI BackgroundTasks instance to handle background tasks.
         db: Database session dependency.
 
     Raises:
@@ -39,18 +42,21 @@ async def create_user(
     Returns:
         None
     """
-    if db.query(auth.models.User).filter_by(username=user.username).first() is not None:
+    hashed_password = await auth_service.hash_password(user.password)
+    user_id = await db.scalar(
+        database.dialect_insert(db, auth.models.User)
+        .values(username=user.username, hashed_password=hashed_password, access_token=None, verified=False)
+        .on_conflict_do_nothing()
+        .returning(auth.models.User.id)
+    )
+    if user_id is None:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail='User already exists'
         )
-    
-    hashed_password = await auth_service.hash_password(user.password)
-    user_model = auth.models.User(username=user.username, hashed_password=hashed_password, access_token=None)
-    
-    background_tasks.add_task(auth_service.send_verification_email, user.username, db)
-    db.add(user_model)
-    db.commit()
+
+    auth_service.queue_verification_email(user.username, db)
+    await db.commit()
 
 @router.post("/token")
 async def login_user(
@@ -70,7 +76,7 @@ async def login_user(
     Returns:
         auth.schemas.Token: An access token and its type.
     """
-    user = db.query(auth.models.User).filter_by(username=user_form.username).first()
+    user = await db.scalar(sqlalchemy.select(auth.models.User).filter_by(username=user_form.username))
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -108,10 +114,10 @@ async def verifie_email(
     Returns:
         dict: A dictionary containing a message about the access status.
     """
-    if auth_service.verifie_email_token(email_token, db):
+    if await auth_service.verifie_email_token(email_token, db):
         return {'detail': 'Access'}
 
-@router_debug.get('')
+@router_debug.get('', response_model=list[auth.schemas.Principal])
 async def get_users(
     db=Depends(database.get_db)
 ):
@@ -122,6 +128,17 @@ async def get_users(
         db: Database session dependency.
 
     Returns:
-        list: A list of all users.
+        list: Id, username and verification status of every user.
+    """
+    user = auth.models.User
+    return (await db.execute(sqlalchemy.select(user.id, user.username, user.verified))).mappings().all()
+
+@router_debug.get('/principal_cache')
+async def get_principal_cache_stats():
+    """
+    Report the authenticated-user cache of this worker.
+
+    Returns:
+        dict: Number of cached users and the hit and miss counters.
     """
-    return [user for user in db.query(auth.models.User).all()]
+    return auth_service.principal_cache.stats()
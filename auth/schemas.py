@@ -12,3 +12,7 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     username: str | None = None
 
+class Principal(BaseModel):
+    id: int
+    username: str
+    verified: bool
@@ -1,18 +1,97 @@
 from datetime import datetime, timezone, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 from passlib.context import CryptContext
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+import sqlalchemy
 import database
 import auth.models
 import auth.schemas
-import smtplib
-from email.mime.text import MIMEText
-from jinja2 import Template
-from dotenv import load_dotenv
+import asyncio
+import time
 import os
 
 
+class BoundedExecutor:
+    """
+    Thread pool for CPU-bound work that refuses new jobs once it is saturated.
+
+    At most `max_workers` jobs run and `max_queue` more wait; anything beyond
+    that fails fast with 503 instead of queueing behind the backlog.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, name: str):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self.capacity = max_workers + max_queue
+        self.in_flight = 0
+
+    async def run(self, func, *args):
+        # Only touched from the event loop thread, so the counter needs no lock
+        if self.in_flight >= self.capacity:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail='Server is busy, try again later',
+                headers={'Retry-After': '1'},
+            )
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.in_flight -= 1
+
+
+class PrincipalCache:
+    """
+    Bounded LRU of authenticated users keyed by token subject and expiry.
+
+    Entries live for `ttl` seconds at most and never past the token expiry.
+    The cache is per process: `invalidate` must be called by every path that
+    verifies, changes or deletes a user.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, subject: str, expiry: int):
+        key = (subject, expiry)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, subject: str, expiry: int, principal: auth.schemas.Principal):
+        ttl = min(self.ttl, expiry - time.time())
+        if ttl <= 0:
+            return
+
+        key = (subject, expiry)
+        self._entries[key] = (time.monotonic() + ttl, principal)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, subject: str):
+        for key in [key for key in self._entries if key[0] == subject]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
 class Service:
 
     crypt_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
@@ -23,18 +102,21 @@ class Service:
     ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
-    
-# email vars
-    subject = "Email Subject"
-    template_path = "\\".join(__file__.split('\\')[:-1]) + r'\templates\verifie_email.html'
 
+    # bcrypt releases the GIL, so a thread pool hashes on several cores
+    hash_executor = BoundedExecutor(
+        max_workers=int(os.environ.get('HASH_WORKERS', os.cpu_count() or 1)),
+        max_queue=int(os.environ.get('HASH_QUEUE', 32)),
+        name='bcrypt',
+    )
 
-    def __init__(self):
-        load_dotenv()
-        print(os.environ.get('SENDER'))
+    principal_cache = PrincipalCache(
+        maxsize=int(os.environ.get('PRINCIPAL_CACHE_SIZE', 10000)),
+        ttl=float(os.environ.get('PRINCIPAL_CACHE_TTL', 60)),
+    )
 
     async def hash_password(self, password:str):
-        return self.crypt_context.hash(password)
+        return await self.hash_executor.run(self.crypt_context.hash, password)
     
     async def create_access_token(self, data:dict):
         to_encode = data.copy()
@@ -51,34 +133,24 @@ class Service:
         return encoded_jwt
 
     async def verify_password(self, plain_pwd: str, hashed_pwd:str):
-        return self.crypt_context.verify(plain_pwd, hashed_pwd)
+        return await self.hash_executor.run(self.crypt_context.verify, plain_pwd, hashed_pwd)
     
-    def send_verification_email(self, email: str, db):
+    def queue_verification_email(self, email: str, db):
+        """
+        Add the email token and its outbox message to the session.
+
+        Nothing is sent here: the caller's commit makes the message visible to
+        the `auth.outbox` worker in the same transaction as the user.
+
+        Args:
+            email (str): Address of the user to verify.
+            db: Database session the rows are added to.
+        """
         email_token = self.create_email_token({'sub': email})
-        email_token_model = auth.models.EmailToken(username=email, email_token=email_token)
-        db.add(email_token_model)
-        db.commit()
-
-        sender_email = os.environ.get('SENDER')
-        sender_password = os.environ.get('PASSWORD')
-        recipient_email = email
-        with open(self.template_path, 'r') as f:
-            template = Template(f.read())
-        context = {
-            'subject': 'Hello from Python',
-            'body': 'This is an email sent from Python using an HTML template and the Gmail SMTP server.'
-        }
-        html = template.render(context, email_token=email_token)
-        html_message = MIMEText(html, 'html')
-        html_message['Subject'] = context['subject']
-        html_message['From'] = sender_email
-        html_message['To'] = recipient_email
-
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, recipient_email, html_message.as_string())
-
-    def verifie_email_token(self, token:str, db):
+        db.add(auth.models.EmailToken(username=email, email_token=email_token))
+        db.add(auth.models.EmailOutbox(recipient=email, email_token=email_token))
+
+    async def verifie_email_token(self, token:str, db):
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
@@ -90,14 +162,15 @@ class Service:
             if username is None:
                 raise credentials_exception
             
-            email_token_user = db.query(auth.models.EmailToken).filter_by(username=username).first()
+            email_token_user = await db.scalar(sqlalchemy.select(auth.models.EmailToken).filter_by(username=username))
             if email_token_user is None:
                 raise credentials_exception
             
             if email_token_user.email_token == token:
-                user = db.query(auth.models.User).filter_by(username=email_token_user.username).first()
+                user = await db.scalar(sqlalchemy.select(auth.models.User).filter_by(username=email_token_user.username))
                 user.verified = True
-                db.commit()
+                await db.commit()
+                self.principal_cache.invalidate(user.username)
                 return True
             return False
 
@@ -121,15 +194,20 @@ class Service:
             headers={"WWW-Authenticate": "Bearer"},
         )
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            # The principal cache is keyed by the expiry, so tokens without one are refused
+            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM], options={'require': ['exp', 'sub']})
             username: str = payload.get("sub")
             if username is None:
                 raise credentials_exception
             token_data = auth.schemas.TokenData(username=username)
         except jwt.exceptions.InvalidTokenError:
             raise credentials_exception
+
+        principal = self.principal_cache.get(token_data.username, payload['exp'])
+        if principal is not None:
+            return principal
         
-        user = db.query(auth.models.User).filter_by(username=token_data.username).first()
+        user = await db.scalar(sqlalchemy.select(auth.models.User).filter_by(username=token_data.username))
         if user is None:
             raise credentials_exception
         if not user.verified:
@@ -137,4 +215,7 @@ class Service:
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail='Verifie your email address'
             )
-        return user
\ No newline at end of file
+
+        principal = auth.schemas.Principal(id=user.id, username=user.username, verified=user.verified)
+        self.principal_cache.put(token_data.username, payload['exp'], principal)
+        return principal
\ No newline at end of file
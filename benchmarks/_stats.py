@@ -0,0 +1,11 @@
+"""
+Summary statistics shared by the benchmarks.
+"""
+
+
+def percentile(samples: list, pct: float) -> float:
+    """
+    Nearest-rank percentile of `samples`, in their unit; 0.0 when there are none.
+    """
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
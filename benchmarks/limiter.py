@@ -0,0 +1,75 @@
+"""
+Per-request overhead of the rate limiter for each storage backend.
+
+Times `limits` fixed-window hits, the call slowapi makes on every limited
+request, and the key functions of `limiter_config`. Pass --redis to also
+time a real Redis-compatible server through `redis+counter://`.
+
+Usage:
+    python -m benchmarks.limiter [--hits 20000] [--keys 100] [--redis redis+counter://localhost:6379/0]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+from starlette.requests import Request
+
+import auth.service
+import benchmarks._stats
+import limiter_config
+
+
+def time_calls(func, args: list) -> list:
+    samples = []
+    for arg in args:
+        started = time.perf_counter()
+        func(arg)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def report(name: str, samples: list):
+    p50, p99 = (benchmarks._stats.percentile(samples, pct) * 1_000_000 for pct in (50, 99))
+    print(f'{name:28} p50 {p50:8.1f} us  p99 {p99:8.1f} us')
+
+
+def main(args):
+    limit = parse('1000000/minute')
+    keys = [f'ip:10.0.{i // 256}.{i % 256}' for i in range(args.keys)]
+    hits = [keys[i % len(keys)] for i in range(args.hits)]
+
+    storages = {
+        'memory://': 'memory://',
+        'sqlitefile://': f'sqlitefile://{tempfile.mkdtemp()}/limits.db',
+    }
+    if args.redis:
+        storages['redis+counter://'] = args.redis
+
+    for name, uri in storages.items():
+        limiter = FixedWindowRateLimiter(storage_from_string(uri))
+        report(f'hit {name}', time_calls(lambda key: limiter.hit(limit, key), hits))
+
+    auth.service.Service.SECRET_KEY = auth.service.Service.SECRET_KEY or 'benchmark-secret-key-of-32-bytes!'
+    token = jwt.encode({'sub': 'bench@example.com'}, auth.service.Service.SECRET_KEY, auth.service.Service.ALGORITHM)
+    requests = [
+        Request({'type': 'http', 'headers': [(b'authorization', f'Bearer {token}'.encode())], 'client': ('10.0.0.1', 1)})
+        for _ in range(args.hits)
+    ]
+    for name, key_func in limiter_config.KEY_FUNCS.items():
+        report(f'key {name}', time_calls(key_func, requests))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hits', type=int, default=20000)
+    parser.add_argument('--keys', type=int, default=100)
+    parser.add_argument('--redis', help='redis+counter:// URL of a server to include')
+    main(parser.parse_args())
@@ -0,0 +1,119 @@
+"""
+Login throughput, and latency of another endpoint while logins are running.
+
+Runs the app in-process on a throwaway SQLite database, whatever DATABASE_URL
+says, since its tables are dropped and recreated. --inline hashes on
+the event loop like the original implementation did, for comparison.
+
+Usage:
+    python -m benchmarks.login [--logins 200] [--concurrency 16] [--inline]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DB_PATH = os.path.join(tempfile.gettempdir(), 'contact_api_bench_login.db')
+DATABASE_URL = f'sqlite+aiosqlite:///{DB_PATH}'
+# Every run starts from empty tables, always on the file above
+os.environ['DB_SCHEMA'] = 'reset'
+os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+import httpx
+import database
+import auth.models
+import auth.routes
+import benchmarks._stats
+import main
+
+USERNAME = 'bench@example.com'
+PASSWORD = 'benchmark-password'
+
+
+class InlineExecutor:
+    async def run(self, func, *args):
+        return func(*args)
+
+
+async def create_user():
+    async with database.DBsession() as db:
+        db.add(auth.models.User(
+            username=USERNAME,
+            hashed_password=auth.routes.auth_service.crypt_context.hash(PASSWORD),
+            verified=True,
+        ))
+        await db.commit()
+
+
+async def run(logins: int, concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        login_latencies = []
+        rejected = 0
+        remaining = logins
+
+        async def login_worker():
+            nonlocal remaining, rejected
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                response = await client.post('/auth/token', data={'username': USERNAME, 'password': PASSWORD})
+                if response.status_code == 503:
+                    rejected += 1
+                else:
+                    login_latencies.append(time.perf_counter() - started)
+
+        probe_latencies = []
+        logins_done = asyncio.Event()
+
+        async def probe():
+            while not logins_done.is_set():
+                started = time.perf_counter()
+                await client.get('/contacts/show_birthday')
+                probe_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.005)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login_worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        logins_done.set()
+        await probe_task
+
+    return {
+        'logins_per_s': len(login_latencies) / elapsed,
+        'login_p50_ms': benchmarks._stats.percentile(login_latencies, 50) * 1000,
+        'login_p99_ms': benchmarks._stats.percentile(login_latencies, 99) * 1000,
+        'rejected_503': rejected,
+        'probe_requests': len(probe_latencies),
+        'probe_p50_ms': benchmarks._stats.percentile(probe_latencies, 50) * 1000,
+        'probe_p99_ms': benchmarks._stats.percentile(probe_latencies, 99) * 1000,
+    }
+
+
+async def main_async(args):
+    if args.inline:
+        auth.routes.auth_service.hash_executor = InlineExecutor()
+
+    await database.connect(DATABASE_URL)
+    try:
+        await create_user()
+        results = await run(args.logins, args.concurrency)
+    finally:
+        await database.disconnect()
+
+    mode = 'inline' if args.inline else 'executor'
+    for name, value in results.items():
+        print(f'{mode:8} {name:15} {value:10.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--inline', action='store_true', help='hash on the event loop, as before the executor')
+    asyncio.run(main_async(parser.parse_args()))
@@ -0,0 +1,88 @@
+"""
+Cost of loading and serializing a page of contacts, old path against new.
+
+The old path loads ORM objects and renders them with `jsonable_encoder` and
+`json.dumps`, as FastAPI does without a response model. The new path selects
+plain rows, validates them with `contacts.schemas.ContactOut` and renders
+them with orjson, as the read endpoints do now. Runs on an in-memory SQLite
+database.
+
+Usage:
+    python -m benchmarks.serialization [--contacts 10000] [--rounds 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+import pydantic
+import sqlalchemy
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+import database
+import contacts.models
+import contacts.schemas
+
+page_adapter = pydantic.TypeAdapter(list[contacts.schemas.ContactOut])
+
+
+async def seed(session_factory, count: int):
+    async with session_factory() as db:
+        await db.execute(sqlalchemy.insert(contacts.models.Contact), [
+            {
+                'firstname': f'First{i}',
+                'lastname': f'Last{i}',
+                'email': f'contact{i}@example.com',
+                'phone': f'+1415{i:07d}',
+                'birthday': f'19{i % 100:02d}-{i % 12 + 1:02d}-{i % 28 + 1:02d}',
+            }
+            for i in range(count)
+        ])
+        await db.commit()
+
+
+async def orm_path(db) -> tuple[float, float, int]:
+    started = time.perf_counter()
+    rows = (await db.scalars(sqlalchemy.select(contacts.models.Contact))).all()
+    loaded = time.perf_counter()
+    body = json.dumps(jsonable_encoder(rows)).encode()
+    return loaded - started, time.perf_counter() - loaded, len(body)
+
+
+async def core_path(db) -> tuple[float, float, int]:
+    started = time.perf_counter()
+    rows = (await db.execute(sqlalchemy.select(*contacts.models.public_columns()))).mappings().all()
+    loaded = time.perf_counter()
+    body = orjson.dumps(page_adapter.dump_python(page_adapter.validate_python(rows)))
+    return loaded - started, time.perf_counter() - loaded, len(body)
+
+
+async def main_async(args):
+    engine = create_async_engine('sqlite+aiosqlite://')
+    async with engine.begin() as conn:
+        await conn.run_sync(database.Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    await seed(session_factory, args.contacts)
+
+    for name, path in (('orm+json', orm_path), ('core+orjson', core_path)):
+        load, encode, size = float('inf'), float('inf'), 0
+        for _ in range(args.rounds):
+            # A fresh session each round, so the ORM identity map starts empty
+            async with session_factory() as db:
+                round_load, round_encode, size = await path(db)
+            load, encode = min(load, round_load), min(encode, round_encode)
+        print(f'{name:12} load {load * 1000:8.2f} ms  serialize {encode * 1000:8.2f} ms  body {size} B')
+
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--contacts', type=int, default=10000)
+    parser.add_argument('--rounds', type=int, default=5)
+    asyncio.run(main_async(parser.parse_args()))
@@ -0,0 +1,49 @@
+"""
+Import cost of the app, from `python -X importtime` in a fresh interpreter.
+
+Usage:
+    python -m benchmarks.startup [--module main] [--top 20]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module: str = 'main') -> dict:
+    """
+    Import `module` in a new interpreter and collect its -X importtime report.
+
+    Args:
+        module (str, optional): Module to import. Defaults to 'main'.
+
+    Returns:
+        dict: Microseconds per imported module, as `(self, cumulative)`.
+    """
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix('import time:').split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def report(times: dict, top: int = 20) -> str:
+    heaviest = sorted(times.items(), key=lambda item: item[1][1], reverse=True)[:top]
+    return '\n'.join(f'{cumulative / 1000:9.1f} ms {own / 1000:9.1f} ms  {name}' for name, (own, cumulative) in heaviest)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='main')
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+    print(' cumulative       self  module')
+    print(report(import_times(args.module), args.top))
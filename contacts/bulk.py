@@ -0,0 +1,232 @@
+import json
+import pydantic
+import sqlalchemy
+import database
+import contacts.models
+import contacts.changes
+import contacts.schemas
+
+# Rows per INSERT statement, well under the bind parameter limits of SQLite and asyncpg
+BATCH_SIZE = 1000
+
+
+def parse_body(body: bytes, content_type: str) -> list:
+    """
+    Decode a bulk request body.
+
+    Args:
+        body (bytes): The raw request body.
+        content_type (str): The Content-Type header of the request.
+
+    Raises:
+        ValueError: If the body is not a JSON array or NDJSON.
+
+    Returns:
+        list: The decoded items, in request order.
+    """
+    if content_type.startswith('application/x-ndjson'):
+        return [json.loads(line) for line in body.splitlines() if line.strip()]
+
+    items = json.loads(body)
+    if not isinstance(items, list):
+        raise ValueError('Expected a JSON array')
+    return items
+
+
+def validate_item(index: int, item) -> tuple:
+    """
+    Validate one raw item as `contacts.schemas.PostContact`.
+
+    Args:
+        index (int): Position of the item in its input, echoed in the result.
+        item: The decoded JSON object.
+
+    Returns:
+        tuple: `((index, values), None)` for a valid item, `(None, result)`
+        with the validation errors for an invalid one.
+    """
+    try:
+        contact = contacts.schemas.PostContact.model_validate(item)
+    except pydantic.ValidationError as error:
+        return None, {
+            'index': index,
+            'status': 'invalid',
+            'detail': [{'loc': list(e['loc']), 'msg': e['msg']} for e in error.errors()],
+        }
+    return (index, contact.model_dump(mode='json')), None
+
+
+def validate(items) -> tuple[list, list]:
+    """
+    Validate raw items as `contacts.schemas.PostContact`.
+
+    Args:
+        items: Iterable of decoded JSON objects.
+
+    Returns:
+        tuple: `(index, values)` pairs ready for insertion, and the result
+        entries of the items that failed validation.
+    """
+    rows, rejected = [], []
+    for index, item in enumerate(items):
+        row, rejection = validate_item(index, item)
+        if row is not None:
+            rows.append(row)
+        else:
+            rejected.append(rejection)
+    return rows, rejected
+
+
+async def insert_batch(db, rows: list) -> list:
+    """
+    Insert one batch of contacts with a single multi-row INSERT.
+
+    Rows clashing with an existing contact, or with an earlier row of the
+    batch, on email or phone are skipped (ON CONFLICT DO NOTHING) and
+    reported instead of failing the batch. The caller commits.
+
+    Args:
+        db: Database session dependency.
+        rows (list): `(index, values)` pairs as returned by `validate`.
+
+    Returns:
+        list: One result entry per row: status 'created' with the new id, or
+        'conflict' with the clashing field.
+    """
+    contact = contacts.models.Contact
+    results, unique = [], []
+    emails, phones = set(), set()
+    for index, values in rows:
+        if values['email'] in emails or values['phone'] in phones:
+            results.append({'index': index, 'status': 'conflict', 'detail': 'Duplicate email or phone in request'})
+            continue
+        emails.add(values['email'])
+        phones.add(values['phone'])
+        unique.append((index, values))
+
+    if not unique:
+        return results
+
+    statement = (
+        database.dialect_insert(db, contact)
+        .values([values for _, values in unique])
+        .on_conflict_do_nothing()
+        .returning(contact.id, contact.email)
+    )
+    inserted = {row.email: row.id for row in await db.execute(statement)}
+    await contacts.changes.record(db, contacts.changes.INSERT, inserted.values())
+
+    existing_emails = set()
+    if len(inserted) < len(unique):
+        # Only batches with conflicts pay for finding out which field clashed
+        existing_emails = set(await db.scalars(
+            sqlalchemy.select(contact.email).where(contact.email.in_(emails - inserted.keys()))
+        ))
+
+    for index, values in unique:
+        if values['email'] in inserted:
+            results.append({'index': index, 'status': 'created', 'id': inserted[values['email']]})
+        else:
+            field = 'email' if values['email'] in existing_emails else 'phone'
+            results.append({'index': index, 'status': 'conflict', 'detail': f'Contact with this {field} already exists'})
+    return results
+
+
+async def insert_contacts(db, rows: list) -> list:
+    """
+    Insert validated rows in batches of `BATCH_SIZE`, see `insert_batch`.
+
+    Returns:
+        list: One result entry per row.
+    """
+    results = []
+    for start in range(0, len(rows), BATCH_SIZE):
+        results.extend(await insert_batch(db, rows[start:start + BATCH_SIZE]))
+    return results
+
+
+def conditions(where: contacts.schemas.ContactFilter) -> list:
+    """
+    SQL conditions of the filters of `where`; its ids are applied by the callers, in batches.
+
+    Args:
+        where (contacts.schemas.ContactFilter): The selection.
+
+    Returns:
+        list: Conditions on `contacts.models.Contact`, all of which must hold.
+    """
+    contact = contacts.models.Contact
+    clauses = []
+    if where.email_domain is not None:
+        # Escaped so the domain is matched literally, never as a LIKE pattern
+        clauses.append(sqlalchemy.func.lower(contact.email).endswith('@' + where.email_domain.lower(), autoescape=True))
+    # Birthdays are stored as ISO strings, which sort like the dates
+    if where.birthday_from is not None:
+        clauses.append(contact.birthday >= where.birthday_from.isoformat())
+    if where.birthday_to is not None:
+        clauses.append(contact.birthday <= where.birthday_to.isoformat())
+    return clauses
+
+
+def id_batches(ids: list) -> list:
+    ids = sorted(set(ids))
+    return [ids[start:start + BATCH_SIZE] for start in range(0, len(ids), BATCH_SIZE)]
+
+
+async def count_matching(db, where: contacts.schemas.ContactFilter) -> int:
+    """
+    Count the contacts selected by `where`, for dry runs.
+
+    Args:
+        db: Database session dependency.
+        where (contacts.schemas.ContactFilter): The selection.
+
+    Returns:
+        int: Number of matching contacts.
+    """
+    contact = contacts.models.Contact
+    statement = sqlalchemy.select(sqlalchemy.func.count()).select_from(contact).where(*conditions(where))
+    if where.ids is None:
+        return await db.scalar(statement)
+    return sum([await db.scalar(statement.where(contact.id.in_(batch))) for batch in id_batches(where.ids)])
+
+
+async def write_matching(db, statement, where: contacts.schemas.ContactFilter, operation: str) -> int:
+    """
+    Run a bulk UPDATE or DELETE of contacts on the selection, `BATCH_SIZE` rows per statement.
+
+    Id lists are split into batches of ids; filters are walked in id order,
+    each statement taking the next batch of matching ids in a subquery.
+    Every statement returns the ids it wrote, which go to the change feed.
+    The caller commits, so all batches share one transaction.
+
+    Args:
+        db: Database session dependency.
+        statement: `sqlalchemy.update` or `sqlalchemy.delete` of `contacts.models.Contact`.
+        where (contacts.schemas.ContactFilter): The selection.
+        operation (str): `contacts.changes.UPDATE` or `contacts.changes.DELETE`.
+
+    Returns:
+        int: Number of contacts written.
+    """
+    contact = contacts.models.Contact
+    statement = statement.where(*conditions(where)).returning(contact.id)
+
+    async def write(batch_statement) -> list:
+        written = (await db.scalars(batch_statement)).all()
+        await contacts.changes.record(db, operation, written)
+        return written
+
+    if where.ids is not None:
+        return sum([len(await write(statement.where(contact.id.in_(batch)))) for batch in id_batches(where.ids)])
+
+    total, after = 0, None
+    while True:
+        batch = sqlalchemy.select(contact.id).where(*conditions(where)).order_by(contact.id).limit(BATCH_SIZE)
+        if after is not None:
+            batch = batch.where(contact.id > after)
+        written = await write(statement.where(contact.id.in_(batch.scalar_subquery())))
+        total += len(written)
+        if len(written) < BATCH_SIZE:
+            return total
+        after = max(written)
@@ -0,0 +1,342 @@
+"""
+Read-through cache of contact reads, invalidated by every write.
+
+The by-id endpoint caches whole contacts; list pages and birthday windows
+are cached under the collection version, itself cached, so one write makes
+all of them unreachable by invalidating a single key. Writers go through
+`contacts.changes.commit`, which invalidates after the commit succeeds.
+
+Concurrent misses for the same key share one load (`SingleFlight`). Loads
+that overlap an invalidation are not served, so a reader can't put back
+data the write just replaced: in this process they aren't stored, and in
+Redis their entries carry the key's generation, which other workers'
+invalidations move on.
+
+The backend comes from CONTACT_CACHE_URL: 'memory://' (default) is a
+bounded LRU in this process, which never sees other processes' writes, so
+`server.py` turns it off when it runs more than one worker;
+'redis://host:6379/0' is shared by every worker.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+import orjson
+import sqlalchemy
+import contacts.changes
+import contacts.models
+
+VERSION_KEY = 'version'
+
+
+class MemoryBackend:
+    """
+    Bounded LRU with a TTL per entry, in this process.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    async def generation(self, key: str):
+        # Writes in this process are covered by the cache's epoch
+        return None
+
+    async def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value, ttl: float, generation=None):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def clear(self):
+        self._entries.clear()
+
+
+class RedisBackend:
+    """
+    Entries as JSON in Redis, or anything speaking its protocol, shared by all workers.
+
+    Every key has a generation, bumped when the key is deleted, and `clear`
+    bumps one shared by all keys. Entries are stored with the generations
+    their load started under and ignored once those moved on, so a load that
+    overlapped another worker's write can't bring the old value back.
+
+    `client` is an asyncio Redis client, e.g. `redis.asyncio.Redis`.
+    """
+
+    PREFIX = 'contact-cache:'
+    GENERATION_PREFIX = 'contact-cache-generation:'
+    CLEARS = 'contact-cache-clears'
+    # Seconds a key's generation is kept after its last use; longer than any entry lives
+    GENERATION_TTL = 24 * 3600
+
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def _generation(raw) -> list:
+        return [int(value) if value is not None else 0 for value in raw]
+
+    async def generation(self, key: str) -> list:
+        return self._generation(await self.client.mget(self.GENERATION_PREFIX + key, self.CLEARS))
+
+    async def get(self, key: str):
+        raw, *generation = await self.client.mget(self.PREFIX + key, self.GENERATION_PREFIX + key, self.CLEARS)
+        if raw is None:
+            return None
+        entry = orjson.loads(raw)
+        return entry['value'] if entry['generation'] == self._generation(generation) else None
+
+    async def set(self, key: str, value, ttl: float, generation: list | None = None):
+        if generation is None:
+            generation = await self.generation(key)
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.set(self.PREFIX + key, orjson.dumps({'generation': generation, 'value': value}), px=int(ttl * 1000))
+        pipeline.expire(self.GENERATION_PREFIX + key, max(self.GENERATION_TTL, int(ttl) + 1))
+        await pipeline.execute()
+
+    async def delete(self, *keys: str):
+        if keys:
+            pipeline = self.client.pipeline(transaction=False)
+            for key in keys:
+                pipeline.incr(self.GENERATION_PREFIX + key)
+                pipeline.expire(self.GENERATION_PREFIX + key, self.GENERATION_TTL)
+            pipeline.delete(*(self.PREFIX + key for key in keys))
+            await pipeline.execute()
+
+    async def clear(self):
+        await self.client.incr(self.CLEARS)
+        keys = [key async for key in self.client.scan_iter(match=self.PREFIX + '*')]
+        if keys:
+            await self.client.delete(*keys)
+
+
+class NullBackend:
+    """
+    Stores nothing: every read loads, though concurrent misses are still coalesced.
+    """
+
+    async def generation(self, key: str):
+        return None
+
+    async def get(self, key: str):
+        return None
+
+    async def set(self, key: str, value, ttl: float, generation=None):
+        pass
+
+    async def delete(self, *keys: str):
+        pass
+
+    async def clear(self):
+        pass
+
+
+class SingleFlight:
+    """
+    Runs one load per key at a time; callers arriving meanwhile await its result.
+
+    A load runs on its caller's session, so it isn't detached from the caller:
+    if the caller is cancelled, waiters start over and one of them loads instead.
+    """
+
+    _RETRY = object()
+
+    def __init__(self):
+        self._flights = {}
+
+    async def do(self, key: str, load):
+        while (flight := self._flights.get(key)) is not None:
+            result = await asyncio.shield(flight)
+            if result is not self._RETRY:
+                return result
+
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        try:
+            result = await load()
+        except asyncio.CancelledError:
+            flight.set_result(self._RETRY)
+            raise
+        except BaseException as error:
+            flight.set_exception(error)
+            # Retrieved here so a flight nobody joined doesn't log a warning
+            flight.exception()
+            raise
+        finally:
+            del self._flights[key]
+        flight.set_result(result)
+        return result
+
+
+class ReadThroughCache:
+    """
+    A backend plus request coalescing and hit counters.
+
+    A backend or TTL left out is read from the environment on first use, so
+    settings from a .env file loaded after this module's import still apply.
+    """
+
+    def __init__(self, backend=None, ttl: float | None = None):
+        self._backend = backend
+        self._ttl = ttl
+        self.flights = SingleFlight()
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = backend_from_env()
+        return self._backend
+
+    @backend.setter
+    def backend(self, backend):
+        self._backend = backend
+
+    @property
+    def ttl(self) -> float:
+        if self._ttl is None:
+            self._ttl = float(os.environ.get('CONTACT_CACHE_TTL', 30))
+        return self._ttl
+
+    @ttl.setter
+    def ttl(self, ttl: float):
+        self._ttl = ttl
+
+    async def get_or_load(self, key: str, load):
+        """
+        Return the cached value of `key`, or load, store and return it.
+
+        Args:
+            key (str): Cache key.
+            load: Coroutine function returning the value; None is not cached.
+        """
+        value = await self.get(key)
+        if value is not None:
+            return value
+        return await self.flights.do(key, lambda: self._load(key, load))
+
+    async def get(self, key: str):
+        """
+        Return the cached value of `key`, or None without loading it.
+        """
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value
+
+    async def _load(self, key: str, load):
+        epoch = self.epoch
+        generation = await self.backend.generation(key)
+        value = await load()
+        if value is not None and epoch == self.epoch:
+            await self.backend.set(key, value, self.ttl, generation)
+        return value
+
+    async def invalidate(self, *keys: str):
+        self.epoch += 1
+        await self.backend.delete(*keys)
+
+    async def clear(self):
+        self.epoch += 1
+        await self.backend.clear()
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'in_flight': len(self.flights._flights)}
+
+
+def backend_from_env():
+    url = os.environ.get('CONTACT_CACHE_URL', 'memory://')
+    if url.startswith('memory://'):
+        return MemoryBackend(int(os.environ.get('CONTACT_CACHE_SIZE', 10000)))
+
+    import redis.asyncio
+    return RedisBackend(redis.asyncio.Redis.from_url(url))
+
+
+cache = ReadThroughCache()
+
+
+def key(*parts) -> str:
+    return ':'.join(str(part) for part in parts)
+
+
+def _datetime(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+async def collection_version(db) -> tuple:
+    """
+    Cached `contacts.changes.collection_version`.
+
+    Returns:
+        tuple: `(version, updated_at)` of the contacts collection.
+    """
+    async def load():
+        version, updated_at = await contacts.changes.collection_version(db)
+        return {'version': version, 'updated_at': updated_at.isoformat() if updated_at else None}
+
+    current = await cache.get_or_load(VERSION_KEY, load)
+    return current['version'], _datetime(current['updated_at'])
+
+
+async def contact(db, contact_id: int, columns: tuple = contacts.models.PUBLIC_COLUMNS) -> dict | None:
+    """
+    Cached public columns, version and update time of one contact.
+
+    Only reads of every column load and store the contact; a miss for some of
+    them selects just those and stores nothing.
+
+    Args:
+        contact_id (int): The contact.
+        columns (tuple, optional): Public columns needed. Defaults to all of them.
+
+    Returns:
+        dict: `row` with at least `columns`, `version` and `updated_at`, or None if there is no such contact.
+    """
+    model = contacts.models.Contact
+
+    async def load():
+        row = (await db.execute(
+            sqlalchemy.select(model.version, model.updated_at, *contacts.models.public_columns(columns))
+            .filter_by(id=contact_id)
+        )).mappings().first()
+        if row is None:
+            return None
+        return {
+            'version': row['version'],
+            'updated_at': row['updated_at'].isoformat(),
+            'row': {column: row[column] for column in columns},
+        }
+
+    if columns == contacts.models.PUBLIC_COLUMNS:
+        cached = await cache.get_or_load(key('contact', contact_id), load)
+    else:
+        cached = await cache.get(key('contact', contact_id)) or await load()
+    if cached is None:
+        return None
+    return {**cached, 'updated_at': _datetime(cached['updated_at'])}
+
+
+async def invalidate(contact_ids):
+    """
+    Drop the cached collection version and the given contacts.
+    """
+    await cache.invalidate(VERSION_KEY, *(key('contact', contact_id) for contact_id in contact_ids))
@@ -0,0 +1,151 @@
+"""
+Bookkeeping shared by every write path of the contacts table.
+
+Writers call `record` (or `touch`, for writes not tied to single contacts)
+before committing, so the bookkeeping lands in the same transaction as the
+change itself, and commit with `commit`, which then drops the cache entries
+the write made stale.
+"""
+from datetime import datetime, timezone
+import sqlalchemy
+import database
+import contacts.models
+import contacts.events
+import contacts.cache
+
+COLLECTION = 'contacts'
+
+# Session.info key of the contact ids whose cache entries the commit invalidates
+STALE = 'contacts_stale'
+
+INSERT = 'insert'
+UPDATE = 'update'
+DELETE = 'delete'
+
+
+async def touch(db):
+    """
+    Bump the change counter of the contacts collection.
+
+    Args:
+        db: Database session of the write; the caller commits.
+    """
+    db.sync_session.info.setdefault(STALE, set())
+    versions = contacts.models.CollectionVersion
+    now = datetime.now(timezone.utc)
+    statement = database.dialect_insert(db, versions).values(name=COLLECTION, version=1, updated_at=now)
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[versions.name],
+        set_={'version': versions.version + 1, 'updated_at': now},
+    ))
+
+
+async def commit(db):
+    """
+    Commit the session, then invalidate the cached reads it made stale.
+
+    Args:
+        db: Database session of the write.
+    """
+    try:
+        await db.commit()
+    except BaseException:
+        db.sync_session.info.pop(STALE, None)
+        raise
+
+    stale = db.sync_session.info.pop(STALE, None)
+    if stale is not None:
+        await contacts.cache.invalidate(stale)
+
+
+async def collection_version(db) -> tuple:
+    """
+    Read the change counter of the contacts collection.
+
+    Returns:
+        tuple: `(version, updated_at)`, or `(0, None)` before the first write.
+    """
+    versions = contacts.models.CollectionVersion
+    row = (await db.execute(
+        sqlalchemy.select(versions.version, versions.updated_at).filter_by(name=COLLECTION)
+    )).first()
+    return tuple(row) if row is not None else (0, None)
+
+
+async def record(db, operation: str, contact_ids):
+    """
+    Log a write to the change feed, bump the collection counter and stage
+    the events pushed to stream subscribers once the session commits.
+
+    The counter row is upserted first: on PostgreSQL its row lock is held
+    until commit, so concurrent writers take change sequence numbers in
+    commit order and a feed reader never skips over a later-committing row.
+
+    Args:
+        db: Database session of the write; the caller commits.
+        operation (str): `INSERT`, `UPDATE` or `DELETE`.
+        contact_ids: Ids of the contacts written.
+    """
+    contact_ids = list(contact_ids)
+    if not contact_ids:
+        return
+
+    await touch(db)
+    db.sync_session.info[STALE].update(contact_ids)
+    change = contacts.models.ContactChange
+    now = datetime.now(timezone.utc)
+    logged = await db.execute(
+        sqlalchemy.insert(change).returning(change.seq, change.contact_id, change.operation, change.changed_at),
+        [{'contact_id': contact_id, 'operation': operation, 'changed_at': now} for contact_id in contact_ids]
+    )
+    contacts.events.stage(db, [dict(row) for row in logged.mappings()])
+
+
+async def changes_since(db, since: int, limit: int) -> tuple[list, bool]:
+    """
+    Read the change feed after sequence number `since`.
+
+    Inserts and updates carry the current public columns of the contact;
+    deletes, and changes to contacts deleted since, carry None instead.
+
+    Args:
+        db: Database session dependency.
+        since (int): Last sequence number the client has applied.
+        limit (int): Maximum number of changes to return.
+
+    Returns:
+        tuple: The changes in sequence order, and whether more follow.
+    """
+    change = contacts.models.ContactChange
+    contact = contacts.models.Contact
+    rows = (await db.execute(
+        sqlalchemy.select(change.seq, change.contact_id, change.operation, change.changed_at,
+                          *contacts.models.public_columns())
+        .outerjoin(contact, sqlalchemy.and_(contact.id == change.contact_id, change.operation != DELETE))
+        .where(change.seq > since)
+        .order_by(change.seq)
+        .limit(limit + 1)
+    )).mappings().all()
+
+    changes = [
+        {
+            'seq': row['seq'],
+            'contact_id': row['contact_id'],
+            'operation': row['operation'],
+            'changed_at': row['changed_at'],
+            'contact': (
+                {column: row[column] for column in contacts.models.PUBLIC_COLUMNS}
+                if row['id'] is not None else None
+            ),
+        }
+        for row in rows[:limit]
+    ]
+    return changes, len(rows) > limit
+
+
+async def last_seq(db) -> int:
+    """
+    Returns:
+        int: The highest sequence number in the change feed, 0 when empty.
+    """
+    return await db.scalar(sqlalchemy.select(sqlalchemy.func.max(contacts.models.ContactChange.seq))) or 0
@@ -0,0 +1,68 @@
+"""
+HTTP conditional requests (ETag / Last-Modified) for contact reads.
+"""
+import email.utils
+import hashlib
+from datetime import datetime, timezone
+from fastapi import Request, Response, status
+
+# Clients may store responses but must revalidate them before reuse
+CACHE_CONTROL = 'private, no-cache'
+
+
+def make_etag(*parts) -> str:
+    """
+    Build a strong ETag from the version of the data and everything else that
+    shapes the representation (page, fields, ...).
+
+    Returns:
+        str: The quoted entity tag.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def _utc(moment: datetime) -> datetime:
+    # SQLite hands back naive datetimes for values stored in UTC
+    return moment if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)
+
+
+def not_modified(request: Request, etag: str, last_modified: datetime | None = None) -> bool:
+    """
+    Evaluate If-None-Match, or If-Modified-Since when no ETag was sent.
+
+    Args:
+        request (Request): The HTTP request object.
+        etag (str): ETag of the current representation.
+        last_modified (datetime, optional): Time of the last change of the data.
+
+    Returns:
+        bool: True if the client's copy is current and a 304 should be sent.
+    """
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        return '*' in tags or etag in tags
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = email.utils.parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return _utc(last_modified).replace(microsecond=0) <= _utc(since)
+
+
+def validator_headers(etag: str, last_modified: datetime | None = None) -> dict:
+    """
+    Build the ETag, Last-Modified and Cache-Control headers of a read.
+    """
+    headers = {'ETag': etag, 'Cache-Control': CACHE_CONTROL}
+    if last_modified is not None:
+        headers['Last-Modified'] = email.utils.format_datetime(_utc(last_modified).astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def not_modified_response(headers: dict) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
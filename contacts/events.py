@@ -0,0 +1,165 @@
+"""
+In-process fan-out of contact writes to Server-Sent Events subscribers.
+
+`contacts.changes.record` stages one event per logged change on the session;
+they are published only once the session commits, so subscribers never see
+a write that was rolled back. Event ids are change feed sequence numbers: a
+client that reconnects with Last-Event-ID is caught up from the feed.
+
+The broker is per process, like the caches in this project. Behind several
+workers each one pushes the writes it handled itself, and clients close the
+gap from the change feed on reconnect.
+"""
+import asyncio
+import json
+import os
+import sqlalchemy
+import sqlalchemy.orm as orm
+from datetime import datetime
+import database
+import contacts.changes
+
+# Session.info key of the events waiting for the commit
+PENDING = 'contact_events'
+
+# Seconds of silence after which a comment line keeps proxies from closing the stream
+HEARTBEAT = float(os.environ.get('SSE_HEARTBEAT', 15))
+
+# Changes read from the feed per query when catching up a reconnecting client
+REPLAY_BATCH = 500
+
+
+class Subscription:
+    """
+    A bounded queue of events for one client. When it overflows, the client
+    is dropped rather than slowing down publishers or growing without bound.
+    """
+
+    def __init__(self, maxsize: int):
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = False
+
+    def offer(self, event: dict) -> bool:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped = True
+        return not self.dropped
+
+
+class Broker:
+    """
+    Fan-out of published events to every live subscription.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.subscriptions = set()
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.queue_size)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscriptions.discard(subscription)
+
+    def publish(self, events: list):
+        # Called on the event loop thread only, like every other in-process state here
+        self.published += len(events)
+        for subscription in list(self.subscriptions):
+            if not all(subscription.offer(event) for event in events):
+                self.dropped += 1
+                self.subscriptions.discard(subscription)
+
+    def stats(self) -> dict:
+        return {
+            'subscribers': len(self.subscriptions),
+            'published': self.published,
+            'dropped_subscribers': self.dropped,
+        }
+
+
+broker = Broker(int(os.environ.get('SSE_QUEUE_SIZE', 256)))
+
+
+def stage(db, events: list):
+    """
+    Queue events to be published when the session `db` commits.
+
+    Args:
+        db: The async database session of the write.
+        events (list): Event dicts with at least `seq`.
+    """
+    db.sync_session.info.setdefault(PENDING, []).extend(events)
+
+
+@sqlalchemy.event.listens_for(orm.Session, 'after_commit')
+def _publish_staged(session):
+    events = session.info.pop(PENDING, None)
+    if events:
+        broker.publish(events)
+
+
+@sqlalchemy.event.listens_for(orm.Session, 'after_rollback')
+def _discard_staged(session):
+    session.info.pop(PENDING, None)
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def format_event(event: dict) -> str:
+    """
+    Render one change as an SSE message whose id is its sequence number.
+    """
+    return f"id: {event['seq']}\nevent: {event['operation']}\ndata: {json.dumps(event, default=_default)}\n\n"
+
+
+async def event_stream(last_event_id: int | None = None, heartbeat: float = HEARTBEAT):
+    """
+    Yield SSE messages for contact writes until the client goes away or falls behind.
+
+    Subscribes before replaying the feed after `last_event_id`, so no change
+    is lost between the two; live events already replayed are skipped.
+
+    Args:
+        last_event_id (int, optional): Sequence number the client saw last.
+        heartbeat (float, optional): Seconds between keepalive comments.
+
+    Yields:
+        str: The next SSE message or comment.
+    """
+    subscription = broker.subscribe()
+    last_seq = last_event_id or 0
+    try:
+        yield ': connected\n\n'
+        if last_event_id is not None:
+            async with database.DBsession() as db:
+                if last_seq > await contacts.changes.last_seq(db):
+                    # The feed was reset since the client's last event
+                    last_seq = 0
+                has_more = True
+                while has_more:
+                    changes, has_more = await contacts.changes.changes_since(db, last_seq, REPLAY_BATCH)
+                    for change in changes:
+                        change.pop('contact')
+                        yield format_event(change)
+                        last_seq = change['seq']
+
+        while not subscription.dropped:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if event['seq'] > last_seq:
+                yield format_event(event)
+                last_seq = event['seq']
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,58 @@
+import csv
+import io
+import orjson
+import sqlalchemy
+import database
+import contacts.models
+
+# Rows fetched from the server-side cursor, and written, per chunk
+CHUNK_SIZE = 1000
+
+
+async def stream_rows(chunk_size: int = CHUNK_SIZE, fields: tuple = contacts.models.PUBLIC_COLUMNS):
+    """
+    Yield all contacts in id order, `chunk_size` rows at a time.
+
+    Reads through a server-side cursor on a session of its own, because the
+    response is streamed after the request's session is closed.
+
+    Args:
+        chunk_size (int, optional): Rows per chunk. Defaults to `CHUNK_SIZE`.
+        fields (tuple, optional): Public columns to read. Defaults to all.
+
+    Yields:
+        list: The next chunk of rows.
+    """
+    statement = (
+        sqlalchemy.select(*contacts.models.public_columns(fields))
+        .order_by(contacts.models.Contact.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    async with database.DBsession() as db:
+        result = await db.stream(statement)
+        async for chunk in result.partitions():
+            yield chunk
+
+
+async def ndjson_lines(chunks, fields: tuple):
+    async for chunk in chunks:
+        yield b''.join(orjson.dumps(row._asdict()) + b'\n' for row in chunk)
+
+
+async def csv_lines(chunks, fields: tuple):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    async for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+FORMATS = {
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+    'csv': (csv_lines, 'text/csv'),
+}
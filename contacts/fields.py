@@ -0,0 +1,33 @@
+from fastapi import HTTPException, status
+import contacts.models
+
+
+def parse_fields(fields: str | None) -> tuple:
+    """
+    Parse the `fields` query parameter of the contact read endpoints.
+
+    The id is always included, since clients address contacts and pages by it.
+
+    Args:
+        fields (str, optional): Comma-separated column names, e.g. 'id,firstname'.
+            None selects every public column.
+
+    Raises:
+        HTTPException: If a name is not a public contact column.
+
+    Returns:
+        tuple: The selected names, in `contacts.models.PUBLIC_COLUMNS` order.
+    """
+    if fields is None:
+        return contacts.models.PUBLIC_COLUMNS
+
+    requested = {name.strip() for name in fields.split(',') if name.strip()}
+    unknown = requested - set(contacts.models.PUBLIC_COLUMNS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Unknown fields: {", ".join(sorted(unknown))}'
+        )
+
+    requested.add('id')
+    return tuple(name for name in contacts.models.PUBLIC_COLUMNS if name in requested)
@@ -0,0 +1,215 @@
+"""
+Synthetic contacts for load testing, generated in parallel and bulk-loaded.
+
+    python -m contacts.generate --count 1000000 [--seed 1] [--offset 0] [--workers N] [--batch-size 10000]
+
+Row `i` depends only on the seed and `offset + i`, so a dataset comes out
+the same whatever the worker count or batch size. Emails and phones are
+built from the row number and never collide with each other; generate
+more rows into the same table with a different --offset.
+
+Batches are generated by a process pool while the previous ones load:
+with COPY on PostgreSQL, an executemany INSERT elsewhere, one transaction
+per batch. Generated rows don't go to the change feed; the collection
+version is bumped once at the end so cached reads and ETags move on.
+"""
+import argparse
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timezone
+
+import sqlalchemy
+from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import database
+import contacts.models
+import contacts.changes
+
+COLUMNS = ('firstname', 'lastname', 'email', 'phone', 'birthday')
+
+FIRST_NAMES = (
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+    'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen',
+    'Daniel', 'Lisa', 'Matthew', 'Nancy', 'Anthony', 'Sandra', 'Mark', 'Ashley', 'Steven', 'Emily',
+    'Andrew', 'Olga', 'Taras', 'Oksana', 'Mykola', 'Iryna', 'Luis', 'Sofia', 'Hiro', 'Amara',
+)
+LAST_NAMES = (
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+    'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+    'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark', 'Lewis', 'Robinson', 'Walker',
+    'Kovalenko', 'Shevchenko', 'Bondarenko', 'Tkachenko', 'Kravchenko', 'Nakamura', 'Okafor', 'Rossi', 'Novak', 'Silva',
+)
+DOMAINS = ('example.com', 'example.org', 'example.net', 'mail.example.com', 'corp.example.net')
+
+# US numbers: area code, then exchange 200-999 and a 4-digit line from the row number
+AREA_CODES = (212, 213, 305, 312, 404, 415, 503, 512, 602, 617, 646, 702, 713, 718, 720, 808, 818, 919, 929, 972)
+NUMBERS_PER_AREA = 800 * 10_000
+
+FIRST_BIRTHDAY = date(1940, 1, 1).toordinal()
+BIRTHDAY_SPAN = date(2010, 12, 31).toordinal() - FIRST_BIRTHDAY + 1
+
+MAX_ROWS = len(AREA_CODES) * NUMBERS_PER_AREA
+
+
+def phone(index: int) -> str:
+    """
+    The phone of row `index`, formatted like `contacts.schemas.Contact` stores it.
+    """
+    area, number = divmod(index, NUMBERS_PER_AREA)
+    exchange, line = divmod(number, 10_000)
+    return f'tel:+1-{AREA_CODES[area]}-{200 + exchange}-{line:04d}'
+
+
+def generate_rows(seed: int, start: int, count: int) -> list[tuple]:
+    """
+    Generate rows `start` to `start + count`, as tuples in `COLUMNS` order.
+
+    Args:
+        seed (int): Seed of the dataset.
+        start (int): Number of the first row.
+        count (int): Number of rows.
+
+    Raises:
+        ValueError: If the rows would run out of unique phone numbers.
+
+    Returns:
+        list: The rows.
+    """
+    if start < 0 or start + count > MAX_ROWS:
+        raise ValueError(f'Row numbers must stay within 0..{MAX_ROWS}')
+
+    rows = []
+    for index in range(start, start + count):
+        value = int.from_bytes(hashlib.blake2b(f'{seed}:{index}'.encode(), digest_size=8).digest())
+        value, first = divmod(value, len(FIRST_NAMES))
+        value, last = divmod(value, len(LAST_NAMES))
+        value, domain = divmod(value, len(DOMAINS))
+        firstname, lastname = FIRST_NAMES[first], LAST_NAMES[last]
+        rows.append((
+            firstname,
+            lastname,
+            f'{firstname}.{lastname}.{index}@{DOMAINS[domain]}'.lower(),
+            phone(index),
+            date.fromordinal(FIRST_BIRTHDAY + value % BIRTHDAY_SPAN).isoformat(),
+        ))
+    return rows
+
+
+async def load_rows(conn, rows: list[tuple]):
+    """
+    Bulk-load rows from `generate_rows` on a connection; the caller commits.
+
+    Args:
+        conn: An async connection inside a transaction.
+        rows (list): The rows.
+    """
+    if conn.dialect.name == 'postgresql':
+        # COPY skips the ORM defaults, so they are filled in here; birthday_key is generated
+        now = datetime.now(timezone.utc)
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            contacts.models.Contact.__tablename__,
+            records=[row + (1, now) for row in rows],
+            columns=COLUMNS + ('version', 'updated_at'),
+        )
+    else:
+        await conn.execute(sqlalchemy.insert(contacts.models.Contact), [dict(zip(COLUMNS, row)) for row in rows])
+
+
+async def generate(engine, count: int, seed: int = 0, offset: int = 0, batch_size: int = 10_000,
+                   workers: int = 1, progress=None) -> float:
+    """
+    Generate and load `count` contacts.
+
+    Args:
+        engine: Async engine of the target database.
+        count (int): Number of contacts.
+        seed (int, optional): Seed of the dataset. Defaults to 0.
+        offset (int, optional): Number of the first row. Defaults to 0.
+        batch_size (int, optional): Rows per generated batch and per transaction.
+        workers (int, optional): Generator processes; 1 generates in this process.
+        progress (optional): Called with the rows loaded so far after each batch.
+
+    Returns:
+        float: Seconds taken.
+    """
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    # Spawned rather than forked: the driver may already run threads (aiosqlite does)
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) if workers > 1 else None
+    starts = iter(range(offset, offset + count, batch_size))
+    pending = deque()
+
+    def submit():
+        start = next(starts, None)
+        if start is None:
+            return
+        size = min(batch_size, offset + count - start)
+        if pool is not None:
+            pending.append(loop.run_in_executor(pool, generate_rows, seed, start, size))
+        else:
+            generated = loop.create_future()
+            generated.set_result(generate_rows(seed, start, size))
+            pending.append(generated)
+
+    try:
+        # Keep every worker busy while the main process loads
+        for _ in range(max(workers, 1) * 2):
+            submit()
+        loaded = 0
+        while pending:
+            rows = await pending.popleft()
+            submit()
+            async with engine.begin() as conn:
+                await load_rows(conn, rows)
+            loaded += len(rows)
+            if progress is not None:
+                progress(loaded)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    async with AsyncSession(engine) as db:
+        await contacts.changes.touch(db)
+        await contacts.changes.commit(db)
+    return time.perf_counter() - started
+
+
+async def main(args):
+    load_dotenv()
+    # Keep existing rows unless asked to start over
+    os.environ.setdefault('DB_SCHEMA', 'create')
+    os.environ.setdefault('DB_POOL_WARMUP', '1')
+    await database.connect()
+
+    started = time.perf_counter()
+
+    def progress(loaded: int):
+        print(f'\r{loaded:,} rows, {loaded / (time.perf_counter() - started):,.0f} rows/s', end='', file=sys.stderr)
+
+    try:
+        elapsed = await generate(
+            database.engine, args.count, seed=args.seed, offset=args.offset,
+            batch_size=args.batch_size, workers=args.workers, progress=progress,
+        )
+    finally:
+        await database.disconnect()
+    print(file=sys.stderr)
+    print(f'{args.count:,} contacts in {elapsed:.1f}s ({args.count / elapsed:,.0f} rows/s)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load synthetic contacts for load testing.')
+    parser.add_argument('--count', type=int, required=True)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--offset', type=int, default=0, help='number of the first row, to add to a dataset')
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    asyncio.run(main(parser.parse_args()))
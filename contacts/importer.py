@@ -0,0 +1,201 @@
+"""
+Streaming import of contacts from CSV or vCard files.
+
+Records flow through generators (parse, validate, batch) into
+`contacts.bulk.insert_batch`, so memory use does not depend on file size.
+Duplicates on email/phone are dropped within each batch and by the unique
+constraints across batches.
+
+    python -m contacts.importer contacts.csv [--format csv|vcard] [--batch-size 1000]
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import os
+import sys
+from dotenv import load_dotenv
+import database
+import contacts.bulk
+import contacts.changes
+
+# Rejected rows kept with their details; beyond that they are only counted
+MAX_REJECTED = 100
+
+
+def read_csv(lines):
+    """
+    Yield contacts from CSV lines with a header row naming the contact fields.
+    """
+    for row in csv.DictReader(lines):
+        yield {key.strip().lower(): value.strip() for key, value in row.items() if key and value is not None}
+
+
+def _unfold(lines):
+    # vCard continuation lines start with a space or a tab
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def _vcard_date(value: str) -> str:
+    if len(value) == 8 and value.isdigit():
+        return f'{value[:4]}-{value[4:6]}-{value[6:]}'
+    return value
+
+
+def read_vcard(lines):
+    """
+    Yield contacts from vCard (3.0/4.0) lines, using N, FN, EMAIL, TEL and BDAY.
+    """
+    card = None
+    for line in _unfold(lines):
+        name, _, value = line.partition(':')
+        key = name.split(';')[0].split('.')[-1].upper()
+        if key == 'BEGIN' and value.strip().upper() == 'VCARD':
+            card = {}
+        elif card is None:
+            continue
+        elif key == 'END':
+            yield card
+            card = None
+        elif key == 'N':
+            lastname, firstname = (value.split(';') + ['', ''])[:2]
+            card['lastname'], card['firstname'] = lastname.strip(), firstname.strip()
+        elif key == 'FN' and 'firstname' not in card:
+            firstname, _, lastname = value.strip().partition(' ')
+            card['firstname'], card['lastname'] = firstname, lastname
+        elif key == 'EMAIL':
+            card.setdefault('email', value.strip())
+        elif key == 'TEL':
+            card.setdefault('phone', value.strip().removeprefix('tel:'))
+        elif key == 'BDAY':
+            card['birthday'] = _vcard_date(value.strip())
+
+
+READERS = {'csv': read_csv, 'vcard': read_vcard}
+
+
+def detect_format(filename: str | None) -> str:
+    extension = os.path.splitext(filename or '')[1].lower()
+    return 'vcard' if extension in ('.vcf', '.vcard') else 'csv'
+
+
+class ImportReport:
+    """
+    Running totals of an import, with the first `MAX_REJECTED` rejected rows.
+    """
+
+    def __init__(self):
+        self.processed = 0
+        self.created = 0
+        self.conflicts = 0
+        self.invalid = 0
+        self.rejected = []
+
+    def add(self, result: dict):
+        self.processed += 1
+        if result['status'] == 'created':
+            self.created += 1
+            return
+
+        if result['status'] == 'conflict':
+            self.conflicts += 1
+        else:
+            self.invalid += 1
+        if len(self.rejected) < MAX_REJECTED:
+            self.rejected.append(result)
+
+    def as_dict(self) -> dict:
+        return {
+            'processed': self.processed,
+            'created': self.created,
+            'conflicts': self.conflicts,
+            'invalid': self.invalid,
+            'rejected': self.rejected,
+        }
+
+
+async def import_contacts(db, records, batch_size: int = contacts.bulk.BATCH_SIZE, progress=None) -> ImportReport:
+    """
+    Validate and insert a stream of contact records, committing every batch.
+
+    Records are read and validated in a worker thread, a batch at a time, so
+    a file-backed stream doesn't block the event loop.
+
+    Args:
+        db: Database session dependency.
+        records: Iterable of raw contact dicts, e.g. from `read_csv`.
+        batch_size (int, optional): Rows per INSERT and per commit.
+        progress (callable, optional): Called with the report after each batch.
+
+    Returns:
+        ImportReport: Totals and rejected rows of the import.
+    """
+    report = ImportReport()
+    indexed = enumerate(records)
+
+    def next_batch():
+        taken, rows, rejections = 0, [], []
+        for index, record in itertools.islice(indexed, batch_size):
+            taken += 1
+            row, rejection = contacts.bulk.validate_item(index, record)
+            if row is not None:
+                rows.append(row)
+            else:
+                rejections.append(rejection)
+        return taken, rows, rejections
+
+    # Reading the file and validating are blocking, so they run in a thread
+    while True:
+        taken, rows, rejections = await asyncio.to_thread(next_batch)
+        if not taken:
+            break
+        for rejection in rejections:
+            report.add(rejection)
+
+        for result in await contacts.bulk.insert_batch(db, rows):
+            report.add(result)
+        await contacts.changes.commit(db)
+
+        if progress is not None:
+            progress(report)
+    return report
+
+
+async def main(args):
+    load_dotenv()
+    os.environ.setdefault('DB_SCHEMA', 'none')
+    os.environ.setdefault('DB_POOL_WARMUP', '1')
+    await database.connect()
+
+    def progress(report):
+        print(f'processed={report.processed} created={report.created} '
+              f'conflicts={report.conflicts} invalid={report.invalid}', file=sys.stderr)
+
+    reader = READERS[args.format or detect_format(args.path)]
+    try:
+        with open(args.path, encoding='utf-8-sig', newline='') as lines:
+            async with database.DBsession() as db:
+                report = await import_contacts(db, reader(lines), args.batch_size, progress)
+    finally:
+        await database.disconnect()
+
+    print(json.dumps(report.as_dict(), indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import contacts from a CSV or vCard file.')
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=sorted(READERS))
+    parser.add_argument('--batch-size', type=int, default=contacts.bulk.BATCH_SIZE)
+    asyncio.run(main(parser.parse_args()))
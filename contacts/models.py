@@ -1,9 +1,16 @@
+import sqlalchemy
 import sqlalchemy.orm as orm
 import database
-from sqlalchemy_file import FileField
+from datetime import date, datetime, timezone
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
 
 class Contact(database.Base):
     __tablename__ = 'Contacts'
+    # Fetch generated columns with RETURNING instead of a lazy refresh
+    __mapper_args__ = {'eager_defaults': True}
 
     id: orm.Mapped[int] = orm.mapped_column(primary_key=True)
     firstname: orm.Mapped[str]
@@ -11,5 +18,124 @@ class Contact(database.Base):
     email: orm.Mapped[str] = orm.mapped_column(unique=True)
     phone: orm.Mapped[str] = orm.mapped_column(unique=True) 
     birthday: orm.Mapped[str]
+    # MMDD of the ISO `birthday` string (e.g. 229 for Feb 29), kept by the database
+    birthday_key: orm.Mapped[int] = orm.mapped_column(
+        sqlalchemy.Computed("CAST(substr(birthday, 6, 2) || substr(birthday, 9, 2) AS INTEGER)", persisted=True),
+        index=True
+    )
     avatar: orm.Mapped[str | None] = orm.mapped_column(default=None)
+    # Bumped by every UPDATE, ORM or Core, and used with updated_at for the ETag
+    version: orm.Mapped[int] = orm.mapped_column(
+        default=1, server_default='1', onupdate=sqlalchemy.literal_column('version + 1')
+    )
+    updated_at: orm.Mapped[datetime] = orm.mapped_column(
+        sqlalchemy.DateTime(timezone=True), default=_now, onupdate=_now
+    )
+
+
+class CollectionVersion(database.Base):
+    """
+    Change counter of a whole table, bumped in the same transaction as every
+    write to it, so collection ETags need no scan of the table itself.
+    """
+    __tablename__ = 'collection_versions'
+
+    name: orm.Mapped[str] = orm.mapped_column(primary_key=True)
+    version: orm.Mapped[int] = orm.mapped_column(default=1)
+    updated_at: orm.Mapped[datetime] = orm.mapped_column(sqlalchemy.DateTime(timezone=True), default=_now)
+
+
+class ContactChange(database.Base):
+    """
+    Append-only log of contact writes, one row per created, updated or
+    deleted contact, read by `GET /contacts/changes` in `seq` order.
+    """
+    __tablename__ = 'contact_changes'
+
+    seq: orm.Mapped[int] = orm.mapped_column(primary_key=True)
+    contact_id: orm.Mapped[int]
+    operation: orm.Mapped[str]
+    changed_at: orm.Mapped[datetime] = orm.mapped_column(sqlalchemy.DateTime(timezone=True), default=_now)
+
+
+# Columns returned by the API, in response order; birthday_key stays internal
+PUBLIC_COLUMNS = ('id', 'firstname', 'lastname', 'email', 'phone', 'birthday', 'avatar')
+
+
+def public_columns(names: tuple = PUBLIC_COLUMNS) -> list:
+    """
+    Columns to select for API reads, so they load as plain rows instead of ORM objects.
+
+    Args:
+        names (tuple, optional): Subset of `PUBLIC_COLUMNS` to select. Defaults to all.
+
+    Returns:
+        list: The named attributes of `Contact`.
+    """
+    return [getattr(Contact, column) for column in names]
+
+
+# Lower-cased text searched by `contacts.search` on PostgreSQL. The separator is
+# rendered inline so queries repeat the indexed expression verbatim.
+_space = sqlalchemy.literal_column("' '")
+search_document = sqlalchemy.func.lower(
+    Contact.firstname + _space + Contact.lastname + _space + Contact.email + _space + Contact.phone
+)
+
+sqlalchemy.Index(
+    'ix_contacts_search_trgm',
+    search_document.label('search_document'),
+    postgresql_using='gin',
+    postgresql_ops={'search_document': 'gin_trgm_ops'},
+).ddl_if(dialect='postgresql')
+
+sqlalchemy.event.listen(
+    Contact.__table__,
+    'before_create',
+    sqlalchemy.DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+)
+
+# SQLite keeps an external-content FTS5 trigram index in sync through triggers
+_sqlite_fts_ddl = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5(
+        firstname, lastname, email, phone,
+        content='Contacts', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS contacts_fts_ai AFTER INSERT ON "Contacts" BEGIN
+        INSERT INTO contacts_fts(rowid, firstname, lastname, email, phone)
+        VALUES (new.id, new.firstname, new.lastname, new.email, new.phone);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS contacts_fts_ad AFTER DELETE ON "Contacts" BEGIN
+        INSERT INTO contacts_fts(contacts_fts, rowid, firstname, lastname, email, phone)
+        VALUES ('delete', old.id, old.firstname, old.lastname, old.email, old.phone);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS contacts_fts_au AFTER UPDATE ON "Contacts" BEGIN
+        INSERT INTO contacts_fts(contacts_fts, rowid, firstname, lastname, email, phone)
+        VALUES ('delete', old.id, old.firstname, old.lastname, old.email, old.phone);
+        INSERT INTO contacts_fts(rowid, firstname, lastname, email, phone)
+        VALUES (new.id, new.firstname, new.lastname, new.email, new.phone);
+    END""",
+]
+for _statement in _sqlite_fts_ddl:
+    sqlalchemy.event.listen(
+        Contact.__table__, 'after_create', sqlalchemy.DDL(_statement).execute_if(dialect='sqlite')
+    )
+sqlalchemy.event.listen(
+    Contact.__table__,
+    'before_drop',
+    sqlalchemy.DDL('DROP TABLE IF EXISTS contacts_fts').execute_if(dialect='sqlite')
+)
+
+
+def birthday_key(day: date) -> int:
+    """
+    Build the month/day key stored in `Contact.birthday_key` for a date.
+
+    Args:
+        day (date): The date to convert.
+
+    Returns:
+        int: The date as MMDD, e.g. 1231 for December 31.
+    """
+    return day.month * 100 + day.day
 
@@ -0,0 +1,39 @@
+import base64
+import binascii
+from fastapi import HTTPException, status
+
+
+def encode_cursor(contact_id: int) -> str:
+    """
+    Encode the last seen contact id into an opaque page cursor.
+
+    Args:
+        contact_id (int): The id of the last contact on the current page.
+
+    Returns:
+        str: URL-safe cursor to pass as `after` for the next page.
+    """
+    return base64.urlsafe_b64encode(str(contact_id).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Decode a page cursor produced by `encode_cursor`.
+
+    Args:
+        cursor (str): The opaque cursor received from the client.
+
+    Raises:
+        HTTPException: If the cursor is malformed.
+
+    Returns:
+        int: The id after which the next page starts.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Invalid cursor'
+        )
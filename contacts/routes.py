@@ -1,80 +1,481 @@
-from fastapi import APIRouter, Depends, Request, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response, File, UploadFile, Query, status
+from fastapi.responses import StreamingResponse
 import contacts.schemas
 import database
 import contacts.models
-from faker import Faker
-from datetime import datetime
+import contacts.pagination
+import contacts.fields
+import contacts.changes
+import contacts.conditional
+import contacts.events
+import contacts.cache
+import contacts.search
+import contacts.bulk
+import contacts.importer
+import contacts.export
+import contacts.generate
+import auth.service
+import sqlalchemy
+from starlette.concurrency import run_in_threadpool
+from datetime import date, timedelta
 from limiter_config import limiter
 
-import cloudinary
-import cloudinary.uploader
-from cloudinary.utils import cloudinary_url
-from dotenv import load_dotenv
+import functools
+import importlib
+import io
 import os 
+import random
 
 
-fake = Faker()
+@functools.cache
+def get_cloudinary():
+    """
+    The cloudinary SDK configured from CLOUD_NAME, CLOUD_KEY and CLOUD_SECRET,
+    imported on the first avatar upload rather than at startup.
+    """
+    cloudinary = importlib.import_module('cloudinary')
+    importlib.import_module('cloudinary.uploader')
+    cloudinary.config(
+        cloud_name = os.environ.get('CLOUD_NAME'),
+        api_key = os.environ.get('CLOUD_KEY'),
+        api_secret = os.environ.get('CLOUD_SECRET'),
+        secure=True
+    )
+    return cloudinary
 
 router = APIRouter(prefix='/contacts', tags=['contacts'])
 router_debug = APIRouter(prefix='/contacts/debug', tags=['contacts debug'])
 
-@router.post("")
+CONFLICT_DETAIL = 'Contact with this email or phone already exists'
+
+
+async def update_returning(db, contact_id: int, values: dict):
+    """
+    Update one contact and read it back with a single UPDATE ... RETURNING, then commit.
+
+    Args:
+        db: Database session dependency.
+        contact_id (int): The ID of the contact to update.
+        values (dict): Columns to write.
+
+    Raises:
+        HTTPException: 404 if there is no such contact, 409 if the new email
+        or phone belongs to another contact.
+
+    Returns:
+        The public columns of the updated contact.
+    """
+    try:
+        contact = (await db.execute(
+            sqlalchemy.update(contacts.models.Contact)
+            .filter_by(id=contact_id)
+            .values(**values)
+            .returning(*contacts.models.public_columns())
+        )).mappings().first()
+    except sqlalchemy.exc.IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=CONFLICT_DETAIL
+        )
+    if contact is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='Contact not found'
+        )
+    await contacts.changes.record(db, contacts.changes.UPDATE, [contact_id])
+    await contacts.changes.commit(db)
+    return contact
+
+@router.post("", response_model=contacts.schemas.ContactOut)
 async def post_contact(
     contact: contacts.schemas.PostContact,
     db = Depends(database.get_db)
 ): 
     """
     Create a new contact.
+
+    The row is inserted and read back in one INSERT ... ON CONFLICT DO
+    NOTHING ... RETURNING statement.
     
     Args:
         contact (contacts.schemas.PostContact): The contact details to be created.
         db: Database session dependency.
 
+    Raises:
+        HTTPException: 409 if a contact with the same email or phone exists.
+
     Returns:
-        contacts.schemas.PostContact: The created contact.
+        contacts.schemas.ContactOut: The stored contact, with its id.
     """
-    new_contact = contacts.models.Contact(**contact.model_dump())
-    db.add(new_contact)
-    db.commit()
-    return contact
+    created = (await db.execute(
+        database.dialect_insert(db, contacts.models.Contact)
+        .values(**contact.model_dump(mode='json'))
+        .on_conflict_do_nothing()
+        .returning(*contacts.models.public_columns())
+    )).mappings().first()
+    if created is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=CONFLICT_DETAIL
+        )
+    await contacts.changes.record(db, contacts.changes.INSERT, [created['id']])
+    await contacts.changes.commit(db)
+    return created
+
+
+@router.post("/bulk")
+async def post_contacts_bulk(
+    request: Request,
+    db = Depends(database.get_db)
+):
+    """
+    Create many contacts in one transaction.
+
+    The body is a JSON array of contacts, or one contact per line with
+    `Content-Type: application/x-ndjson`. Rows are written with multi-row
+    INSERT statements; invalid rows and email/phone conflicts are reported
+    per row without aborting the others.
+
+    Args:
+        request (Request): The HTTP request object.
+        db: Database session dependency.
+
+    Raises:
+        HTTPException: If the body is neither a JSON array nor NDJSON.
+
+    Returns:
+        dict: Counts of created, conflicting and invalid rows, and a result
+        per row under `results` in request order.
+    """
+    try:
+        items = contacts.bulk.parse_body(await request.body(), request.headers.get('content-type', ''))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Body must be a JSON array or NDJSON'
+        )
+
+    rows, results = contacts.bulk.validate(items)
+    results.extend(await contacts.bulk.insert_contacts(db, rows))
+    await contacts.changes.commit(db)
+
+    results.sort(key=lambda result: result['index'])
+    return {
+        'created': sum(result['status'] == 'created' for result in results),
+        'conflicts': sum(result['status'] == 'conflict' for result in results),
+        'invalid': sum(result['status'] == 'invalid' for result in results),
+        'results': results,
+    }
+
+
+@router.patch("/bulk", response_model=contacts.schemas.BulkResult)
+async def patch_contacts_bulk(
+    body: contacts.schemas.BulkPatch,
+    db = Depends(database.get_db)
+):
+    """
+    Update the same columns of many contacts, selected by ids and/or filters.
+
+    Rows are written by set-based UPDATE statements of up to
+    `contacts.bulk.BATCH_SIZE` contacts each, in one transaction.
+
+    Args:
+        body (contacts.schemas.BulkPatch): The selection, the columns to set
+            and whether to only count the matching contacts.
+        db: Database session dependency.
+
+    Raises:
+        HTTPException: 409 if the new email or phone would be shared by
+        several contacts; nothing is updated then.
+
+    Returns:
+        contacts.schemas.BulkResult: Number of contacts updated, or matching with `dry_run`.
+    """
+    if body.dry_run:
+        return {'rows': await contacts.bulk.count_matching(db, body.where), 'dry_run': True}
+
+    statement = sqlalchemy.update(contacts.models.Contact).values(**body.values.model_dump(mode='json', exclude_unset=True))
+    try:
+        rows = await contacts.bulk.write_matching(db, statement, body.where, contacts.changes.UPDATE)
+    except sqlalchemy.exc.IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=CONFLICT_DETAIL
+        )
+    await contacts.changes.commit(db)
+    return {'rows': rows, 'dry_run': False}
+
+
+@router.delete("/bulk", response_model=contacts.schemas.BulkResult)
+async def delete_contacts_bulk(
+    body: contacts.schemas.BulkDelete,
+    db = Depends(database.get_db)
+):
+    """
+    Delete many contacts, selected by ids and/or filters.
+
+    Rows are removed by set-based DELETE statements of up to
+    `contacts.bulk.BATCH_SIZE` contacts each, in one transaction.
+
+    Args:
+        body (contacts.schemas.BulkDelete): The selection and whether to only
+            count the matching contacts.
+        db: Database session dependency.
+
+    Returns:
+        contacts.schemas.BulkResult: Number of contacts deleted, or matching with `dry_run`.
+    """
+    if body.dry_run:
+        return {'rows': await contacts.bulk.count_matching(db, body.where), 'dry_run': True}
+
+    rows = await contacts.bulk.write_matching(
+        db, sqlalchemy.delete(contacts.models.Contact), body.where, contacts.changes.DELETE
+    )
+    await contacts.changes.commit(db)
+    return {'rows': rows, 'dry_run': False}
+
+
+@router.post("/import")
+async def post_contacts_import(
+    file: UploadFile = File(),
+    file_format: str | None = Query(None, alias='format'),
+    db = Depends(database.get_db)
+):
+    """
+    Import contacts from an uploaded CSV or vCard file.
+
+    The file is parsed as a stream and inserted in batches, each committed on
+    its own, so memory use stays flat for files of any size. CSV files need a
+    header row with firstname, lastname, email, phone and birthday.
+
+    Args:
+        file (UploadFile): The CSV or vCard file.
+        file_format (str, optional): 'csv' or 'vcard'; guessed from the file name when omitted.
+        db: Database session dependency.
+
+    Raises:
+        HTTPException: If the format is not supported.
+
+    Returns:
+        dict: Counts of processed, created, conflicting and invalid rows, and
+        the first rejected rows with their reason.
+    """
+    reader = contacts.importer.READERS.get(file_format or contacts.importer.detect_format(file.filename))
+    if reader is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Unsupported format, use one of: {", ".join(contacts.importer.READERS)}'
+        )
+
+    lines = io.TextIOWrapper(file.file, encoding='utf-8-sig', newline='')
+    try:
+        report = await contacts.importer.import_contacts(db, reader(lines))
+    finally:
+        lines.detach()
+    return report.as_dict()
+
+
+@router.get("/export")
+async def export_contacts(
+    file_format: str = Query('ndjson', alias='format', pattern='^(ndjson|csv)$'),
+    fields: str | None = None
+):
+    """
+    Stream every contact as NDJSON or CSV.
 
+    Rows are read from a server-side cursor and written in fixed-size chunks,
+    so memory use stays the same however large the table grows.
 
-@router.get("")
+    Args:
+        file_format (str, optional): 'ndjson' or 'csv'. Defaults to 'ndjson'.
+        fields (str, optional): Comma-separated columns to export. Defaults to all.
+
+    Returns:
+        StreamingResponse: The contacts in id order.
+    """
+    columns = contacts.fields.parse_fields(fields)
+    encode, media_type = contacts.export.FORMATS[file_format]
+    return StreamingResponse(
+        encode(contacts.export.stream_rows(fields=columns), columns),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="contacts.{file_format}"'},
+    )
+
+
+@router.get("/changes", response_model=contacts.schemas.ChangePage)
+async def get_contact_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db = Depends(database.get_db)
+):
+    """
+    Retrieve the contact writes that happened after sequence number `since`.
+
+    Clients keep a local copy in sync by applying the changes in order and
+    passing `next_since` on the next call, so a sync reads only what changed.
+    Deletes are reported as tombstones without contact data.
+
+    Args:
+        since (int, optional): Last sequence number applied by the client. Defaults to 0.
+        limit (int, optional): Maximum number of changes to return. Defaults to 100.
+        db: Database session dependency.
+
+    Raises:
+        HTTPException: If `since` is ahead of the feed, e.g. after a data reset;
+            the client has to re-download the contacts.
+
+    Returns:
+        contacts.schemas.ChangePage: The changes under `changes`, the sequence
+        number to resume from under `next_since` and `has_more`.
+    """
+    changes, has_more = await contacts.changes.changes_since(db, since, limit)
+    if not changes and since > await contacts.changes.last_seq(db):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail='Change feed was reset, fetch all contacts again'
+        )
+
+    return {
+        'changes': changes,
+        'next_since': changes[-1]['seq'] if changes else since,
+        'has_more': has_more,
+    }
+
+
+@router.get("/stream")
+async def stream_contact_events(
+    last_event_id: int | None = Header(None)
+):
+    """
+    Push contact creates, updates and deletes as Server-Sent Events.
+
+    Each event carries the change feed entry (seq, contact_id, operation,
+    changed_at) with the sequence number as its id. Reconnecting with
+    Last-Event-ID replays what was missed. Clients too slow to keep up are
+    disconnected and catch up the same way; idle streams get a keepalive
+    comment every few seconds.
+
+    Args:
+        last_event_id (int, optional): The Last-Event-ID header sent on reconnect.
+
+    Returns:
+        StreamingResponse: The event stream.
+    """
+    return StreamingResponse(
+        contacts.events.event_stream(last_event_id),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@router.get("", response_model=contacts.schemas.ContactPage, response_model_exclude_unset=True)
 @limiter.limit('5/minute')
 async def get_all_contacts(
     request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    after: str | None = None,
+    fields: str | None = None,
     db = Depends(database.get_db)
 ): 
     """
-    Retrieve all contacts.
+    Retrieve a page of contacts ordered by id.
+
+    Pages are addressed by keyset (`id > after`) rather than OFFSET, so every
+    page is a primary key range scan no matter how deep the client has paged.
+    The ETag follows the change counter of the table, so `If-None-Match` is
+    answered with 304 after a single-row lookup. Pages are cached under that
+    counter (see `contacts.cache`), so a write makes them all stale at once.
 
     Args:
         request (Request): The HTTP request object.
+        response (Response): The response whose validator headers are set.
+        limit (int, optional): Maximum number of contacts per page. Defaults to 50.
+        after (str, optional): Cursor returned as `next_cursor` by the previous page.
+        fields (str, optional): Comma-separated columns to return, e.g. 'id,firstname'. Defaults to all.
         db: Database session dependency.
 
     Returns:
-        list: A list of all contacts.
+        contacts.schemas.ContactPage: The contacts of the page under `items`
+        and the cursor of the next page under `next_cursor` (None on the last page).
     """
-    return [i for i in db.query(contacts.models.Contact).all()]
+    columns = contacts.fields.parse_fields(fields)
+    after_id = contacts.pagination.decode_cursor(after) if after is not None else None
+
+    version, updated_at = await contacts.cache.collection_version(db)
+    headers = contacts.conditional.validator_headers(
+        contacts.conditional.make_etag(version, updated_at, limit, after_id, columns), updated_at
+    )
+    if contacts.conditional.not_modified(request, headers['ETag'], updated_at):
+        return contacts.conditional.not_modified_response(headers)
+    response.headers.update(headers)
 
-@router.get("{contact_id}")
+    async def load_page():
+        statement = sqlalchemy.select(*contacts.models.public_columns(columns))
+        if after_id is not None:
+            statement = statement.where(contacts.models.Contact.id > after_id)
+
+        page = (await db.execute(statement.order_by(contacts.models.Contact.id).limit(limit + 1))).mappings().all()
+
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = contacts.pagination.encode_cursor(page[-1]['id'])
+        return {'items': [dict(row) for row in page], 'next_cursor': next_cursor}
+
+    return await contacts.cache.cache.get_or_load(
+        contacts.cache.key('page', version, updated_at, limit, after_id, ','.join(columns)), load_page
+    )
+
+@router.get("/{contact_id:int}", response_model=contacts.schemas.ContactFields, response_model_exclude_unset=True)
 async def get_contact_by_id(
     contact_id:int,
+    request: Request,
+    response: Response,
+    fields: str | None = None,
     db = Depends(database.get_db)
 ): 
     """
     Retrieve a contact by its ID.
 
+    The contact is served from `contacts.cache` when possible, and a
+    conditional request is answered with 304 from its cached version. A
+    miss with `fields` selects only those columns.
+
     Args:
         contact_id (int): The ID of the contact to retrieve.
+        request (Request): The HTTP request object.
+        response (Response): The response whose validator headers are set.
+        fields (str, optional): Comma-separated columns to return. Defaults to all.
         db: Database session dependency.
 
+    Raises:
+        HTTPException: If the contact does not exist.
+
     Returns:
-        contacts.models.Contact: The contact with the specified ID.
+        contacts.schemas.ContactFields: The contact with the specified ID.
     """
-    return db.query(contacts.models.Contact).filter_by(id=contact_id).first()
+    columns = contacts.fields.parse_fields(fields)
+    contact = await contacts.cache.contact(db, contact_id, columns)
+    if contact is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='Contact not found'
+        )
+
+    headers = contacts.conditional.validator_headers(
+        contacts.conditional.make_etag(contact_id, contact['version'], contact['updated_at'], columns),
+        contact['updated_at']
+    )
+    if contacts.conditional.not_modified(request, headers['ETag'], contact['updated_at']):
+        return contacts.conditional.not_modified_response(headers)
+    response.headers.update(headers)
+
+    return {column: contact['row'][column] for column in columns}
 
-@router.put("{contact_id}")
+@router.put("/{contact_id:int}", response_model=list[contacts.schemas.ContactOut])
 async def update_contact(
     contact_id: int,
     new_contact: contacts.schemas.Contact,
@@ -88,15 +489,50 @@ async def update_contact(
         new_contact (contacts.schemas.Contact): The new contact details.
         db: Database session dependency.
 
+    Raises:
+        HTTPException: 404 if the contact doesn't exist, 409 if the email or
+        phone belongs to another contact.
+
     Returns:
         list: The updated contact.
     """
-    contact = db.query(contacts.models.Contact).filter_by(id=contact_id)
-    contact.update(new_contact.__dict__)
-    db.commit()
-    return contact.all()
+    return [await update_returning(db, contact_id, new_contact.model_dump(mode='json'))]
+
+@router.patch("/{contact_id:int}", response_model=contacts.schemas.ContactOut)
+async def patch_contact(
+    contact_id: int,
+    changes: contacts.schemas.PatchContact,
+    db = Depends(database.get_db),
+):
+    """
+    Update some columns of a contact; the UPDATE sets only those in the body.
+
+    Args:
+        contact_id (int): The ID of the contact to update.
+        changes (contacts.schemas.PatchContact): The columns to change.
+        db: Database session dependency.
+
+    Raises:
+        HTTPException: 404 if the contact doesn't exist, 409 if the email or
+        phone belongs to another contact.
 
-@router.delete("{contact_id}")
+    Returns:
+        contacts.schemas.ContactOut: The updated contact.
+    """
+    values = changes.model_dump(mode='json', exclude_unset=True)
+    if values:
+        return await update_returning(db, contact_id, values)
+
+    # Nothing to write: answer like a read, without bumping the version
+    contact = await contacts.cache.contact(db, contact_id)
+    if contact is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='Contact not found'
+        )
+    return contact['row']
+
+@router.delete("/{contact_id:int}")
 async def delete_contact(
     contact_id: int,
     db = Depends(database.get_db)
@@ -111,64 +547,80 @@ async def delete_contact(
     Returns:
         None
     """
-    contact = db.query(contacts.models.Contact).filter_by(id=contact_id)
-    contact.delete()
-    db.commit()
+    result = await db.execute(sqlalchemy.delete(contacts.models.Contact).filter_by(id=contact_id))
+    if result.rowcount:
+        await contacts.changes.record(db, contacts.changes.DELETE, [contact_id])
+    await contacts.changes.commit(db)
 
 
-@router.get("/show_birthday")
+@router.get("/show_birthday", response_model=list[contacts.schemas.ContactOut])
 async def get_7_days_birthday_contact(
+    days: int = Query(7, ge=0, le=366),
     db = Depends(database.get_db)
 ): 
     """
-    Retrieve contacts with birthdays in the next 7 days.
+    Retrieve contacts with birthdays in the next `days` days, soonest first.
+
+    The window is matched against the indexed `birthday_key` (MMDD), so the
+    lookup is a range scan split in two when it crosses the new year. Feb 29
+    birthdays fall between Feb 28 and Mar 1 and are found in any year.
+    Results are cached per day and collection version.
 
     Args:
+        days (int, optional): Size of the window in days, today included. Defaults to 7.
         db: Database session dependency.
 
     Returns:
         list: A list of contacts with upcoming birthdays.
     """
-    date_now = datetime.now()
-    all_contacts = db.query(contacts.models.Contact).all()
-
-    matched_contacts = []
-    for contact in all_contacts:
-        birthday_lst = contact.birthday.split('-')
-        birthday = datetime(date_now.year, int(birthday_lst[1]), int(birthday_lst[2]))
-
-        if birthday < date_now:
-            birthday = datetime(date_now.year + 1, int(birthday_lst[1]), int(birthday_lst[2]))               
-
-        if 0 <= (birthday - date_now).days <= 7:
-            matched_contacts.append(contact)
-    
-    return matched_contacts
+    today = date.today()
+    end = today + timedelta(days=days)
+    start_key = contacts.models.birthday_key(today)
+    end_key = contacts.models.birthday_key(end)
+    key = contacts.models.Contact.birthday_key
+
+    statement = sqlalchemy.select(*contacts.models.public_columns())
+    if end.year == today.year:
+        statement = statement.where(key.between(start_key, end_key)).order_by(key)
+    else:
+        statement = statement.where(sqlalchemy.or_(key >= start_key, key <= end_key)).order_by(
+            sqlalchemy.case((key < start_key, 1), else_=0), key
+        )
+
+    async def load_window():
+        return [dict(row) for row in (await db.execute(statement)).mappings()]
+
+    version, updated_at = await contacts.cache.collection_version(db)
+    return await contacts.cache.cache.get_or_load(
+        contacts.cache.key('birthday', version, updated_at, today, days), load_window
+    )
 
-@router.get("/query/{query}")
+@router.get("/query/{query}", response_model=list[contacts.schemas.ContactFields], response_model_exclude_unset=True)
 async def get_by_query(
     query: str,
+    limit: int = Query(20, ge=1, le=100),
+    fields: str | None = None,
     db = Depends(database.get_db)
 ):
     """
-    Retrieve contacts matching a specific query.
+    Search contacts by name, email or phone.
+
+    Matching is case-insensitive on any prefix or substring and is served by
+    the search index of the database (see `contacts.search`).
 
     Args:
-        query (str): The query string to search for.
+        query (str): The text to search for.
+        limit (int, optional): Maximum number of contacts to return. Defaults to 20.
+        fields (str, optional): Comma-separated columns to return. Defaults to all.
         db: Database session dependency.
 
     Returns:
-        list: A list of contacts matching the query.
+        list: Matching contacts, best match first.
     """
-    all_contacts = db.query(contacts.models.Contact).all()
-    
-    matched = list()
-    for contact in all_contacts:
-        for value in contact.__dict__.values(): 
-            if str(value) == query:
-                matched.append(contact)
-
-    return matched 
+    statement = contacts.search.search_statement(
+        db.get_bind().dialect.name, query, limit, contacts.fields.parse_fields(fields)
+    )
+    return (await db.execute(statement)).mappings().all()
 
 @router.post("/avatar")
 async def upload_image(
@@ -184,27 +636,30 @@ async def upload_image(
         file (UploadFile): The image file to upload.
         db: Database session dependency.
 
+    Raises:
+        HTTPException: 404 if the contact doesn't exist.
+
     Returns:
         dict: A dictionary indicating success.
     """
-    load_dotenv()
-
-    cloudinary.config( 
-        cloud_name = os.environ.get('CLOUD_NAME'), 
-        api_key = os.environ.get('CLOUD_KEY'), 
-        api_secret = os.environ.get('CLOUD_SECRET'), 
-        secure=True
+    # Checked before uploading, so a missing contact doesn't leave an image behind
+    exists = await db.scalar(
+        sqlalchemy.select(contacts.models.Contact.id).filter_by(id=contact_id)
     )
+    if exists is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='Contact not found'
+        )
 
-    req = cloudinary.uploader.upload(file.file, public_id="root", overwrite=True)
+    cloudinary = get_cloudinary()
+    req = await run_in_threadpool(cloudinary.uploader.upload, file.file, public_id="root", overwrite=True)
 
     src_url = cloudinary.CloudinaryImage('root').build_url(
         width=500, height=500, crop="auto", version=req.get('version')
     ) 
 
-    user = db.query(contacts.models.Contact).filter_by(id=contact_id).first()
-    user.avatar = src_url
-    db.commit()
+    await update_returning(db, contact_id, {'avatar': src_url})
     return {'ok': True}
 
 
@@ -221,38 +676,46 @@ async def clear_data(
     Returns:
         None
     """
-    engine = database.engine
-    contacts.models.Contact.metadata.drop_all(engine)
-    contacts.models.Contact.metadata.create_all(engine)
-    db.commit()
-
-@router_debug.post("") 
+    connection = await db.connection()
+    await connection.run_sync(contacts.models.Contact.metadata.drop_all)
+    await connection.run_sync(contacts.models.Contact.metadata.create_all)
+    await contacts.changes.touch(db)
+    await contacts.changes.commit(db)
+    # Ids start over in the new table
+    await contacts.cache.cache.clear()
+    # The metadata includes the users table
+    auth.service.Service.principal_cache.clear()
+
+@router_debug.post("", response_model=list[contacts.schemas.ContactOut])
 async def fake_data_flud(
     db = Depends(database.get_db),
-    quantity:int = 5
+    quantity: int = Query(5, ge=1, le=contacts.bulk.BATCH_SIZE),
+    seed: int | None = None
 ):
     """
     Populate the database with fake contact data for testing.
 
+    Rows come from `contacts.generate`, numbered after the highest contact
+    id so their emails and phones are new; rows clashing anyway are
+    skipped. Larger datasets are loaded with `python -m contacts.generate`.
+
     Args:
         db: Database session dependency.
         quantity (int, optional): Number of fake contacts to create. Defaults to 5.
+        seed (int, optional): Seed of the generated data. Defaults to a random one.
 
     Returns:
         list: A list of the created fake contacts.
     """
-    new_contacts = list()
-    for _ in range(quantity+1):
-        new_contact = contacts.models.Contact(**{"firstname": fake.first_name(),
-                                        "lastname": fake.last_name(),
-                                        "email": fake.email(),
-                                        "phone": fake.phone_number(),
-                                        "birthday": fake.date(),
-                                        "avatar": None
-                                        })
-        
-        db.add(new_contact)
-        new_contacts.append(new_contact.__dict__)
-
-    db.commit()
-    return new_contacts
+    offset = await db.scalar(sqlalchemy.select(sqlalchemy.func.coalesce(sqlalchemy.func.max(contacts.models.Contact.id), 0)))
+    rows = contacts.generate.generate_rows(seed if seed is not None else random.randrange(2 ** 32), offset, quantity)
+
+    created = (await db.execute(
+        database.dialect_insert(db, contacts.models.Contact)
+        .values([dict(zip(contacts.generate.COLUMNS, row)) for row in rows])
+        .on_conflict_do_nothing()
+        .returning(*contacts.models.public_columns())
+    )).mappings().all()
+    await contacts.changes.record(db, contacts.changes.INSERT, [row['id'] for row in created])
+    await contacts.changes.commit(db)
+    return created
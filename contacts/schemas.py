@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 import pydantic
-from datetime import date
+from datetime import date, datetime
 from pydantic_extra_types.phone_numbers import PhoneNumber
 
 class Contact(BaseModel):
@@ -11,4 +11,93 @@ class Contact(BaseModel):
     birthday: date
 
 class PostContact(Contact):
-    pass
\ No newline at end of file
+    pass
+
+class PatchContact(BaseModel):
+    """
+    Columns of a partial update; only the ones present in the request are written, and none may be null.
+    """
+    firstname: str = None
+    lastname: str = None
+    email: pydantic.EmailStr = None
+    phone: PhoneNumber = None
+    birthday: date = None
+
+class ContactFilter(BaseModel):
+    """
+    Contacts selected by id and/or by filters; every given criterion must match.
+    """
+    ids: list[int] | None = None
+    email_domain: str | None = None
+    birthday_from: date | None = None
+    birthday_to: date | None = None
+
+    @pydantic.field_validator('email_domain')
+    @classmethod
+    def plain_domain(cls, value):
+        if value is not None and (not value or '@' in value):
+            raise ValueError('Give the domain after @')
+        return value
+
+    @pydantic.model_validator(mode='after')
+    def not_empty(self):
+        if self.ids is None and self.email_domain is None and self.birthday_from is None and self.birthday_to is None:
+            raise ValueError('Select contacts with ids or at least one filter')
+        return self
+
+class BulkDelete(BaseModel):
+    where: ContactFilter
+    dry_run: bool = False
+
+class BulkPatch(BulkDelete):
+    values: PatchContact
+
+    @pydantic.model_validator(mode='after')
+    def not_empty(self):
+        if not self.values.model_fields_set:
+            raise ValueError('Set at least one column in values')
+        return self
+
+class BulkResult(BaseModel):
+    """
+    Contacts written, or with `dry_run` the contacts that would be.
+    """
+    rows: int
+    dry_run: bool
+
+class ContactOut(BaseModel):
+    id: int
+    firstname: str
+    lastname: str
+    email: str
+    phone: str
+    birthday: date
+    avatar: str | None = None
+
+class ContactFields(BaseModel):
+    """
+    A contact limited to the columns requested with `fields`; the others are left out of the response.
+    """
+    id: int
+    firstname: str | None = None
+    lastname: str | None = None
+    email: str | None = None
+    phone: str | None = None
+    birthday: date | None = None
+    avatar: str | None = None
+
+class ContactPage(BaseModel):
+    items: list[ContactFields]
+    next_cursor: str | None = None
+
+class ContactChange(BaseModel):
+    seq: int
+    contact_id: int
+    operation: str
+    changed_at: datetime
+    contact: ContactOut | None = None
+
+class ChangePage(BaseModel):
+    changes: list[ContactChange]
+    next_since: int
+    has_more: bool
@@ -0,0 +1,90 @@
+import sqlalchemy
+import contacts.models
+
+SEARCH_COLUMNS = ('firstname', 'lastname', 'email', 'phone')
+
+# Shortest query the trigram indexes can answer
+MIN_TRIGRAM_LENGTH = 3
+
+_fts = sqlalchemy.table('contacts_fts', sqlalchemy.column('rowid'))
+
+
+def _escape_like(value: str) -> str:
+    return value.replace('/', '//').replace('%', '/%').replace('_', '/_')
+
+
+def _prefix_match(query: str):
+    pattern = _escape_like(query) + '%'
+    return sqlalchemy.or_(*(
+        sqlalchemy.func.lower(getattr(contacts.models.Contact, column)).like(pattern, escape='/')
+        for column in SEARCH_COLUMNS
+    ))
+
+
+def _prefix_rank(query: str):
+    # Contacts with a field starting with the query rank above mere substring hits
+    return sqlalchemy.case((_prefix_match(query), 0), else_=1)
+
+
+def _postgresql_statement(query: str, limit: int, fields: tuple):
+    contact = contacts.models.Contact
+    document = contacts.models.search_document
+    return (
+        sqlalchemy.select(*contacts.models.public_columns(fields))
+        .where(document.like('%' + _escape_like(query) + '%', escape='/'))
+        .order_by(_prefix_rank(query), sqlalchemy.func.similarity(document, query).desc(), contact.id)
+        .limit(limit)
+    )
+
+
+def _sqlite_statement(query: str, limit: int, fields: tuple):
+    contact = contacts.models.Contact
+    if len(query) < MIN_TRIGRAM_LENGTH:
+        return _fallback_statement(query, limit, fields)
+
+    phrase = '"' + query.replace('"', '""') + '"'
+    return (
+        sqlalchemy.select(*contacts.models.public_columns(fields))
+        .join(_fts, _fts.c.rowid == contact.id)
+        .where(sqlalchemy.literal_column('contacts_fts').op('MATCH')(phrase))
+        .order_by(_prefix_rank(query), sqlalchemy.func.bm25(sqlalchemy.literal_column('contacts_fts')), contact.id)
+        .limit(limit)
+    )
+
+
+def _fallback_statement(query: str, limit: int, fields: tuple):
+    contact = contacts.models.Contact
+    return (
+        sqlalchemy.select(*contacts.models.public_columns(fields))
+        .where(_prefix_match(query))
+        .order_by(contact.id)
+        .limit(limit)
+    )
+
+
+def search_statement(dialect: str, query: str, limit: int, fields: tuple = contacts.models.PUBLIC_COLUMNS):
+    """
+    Build the search statement for the database dialect in use.
+
+    PostgreSQL matches substrings through the `ix_contacts_search_trgm`
+    trigram index and ranks by similarity; SQLite matches through the
+    `contacts_fts` FTS5 trigram table and ranks by bm25. Prefix matches on any
+    field rank first. Queries shorter than a trigram, and other dialects,
+    fall back to a prefix match on the searched columns.
+
+    Args:
+        dialect (str): Name of the SQLAlchemy dialect, e.g. 'postgresql'.
+        query (str): The text to look for in name, email and phone.
+        limit (int): Maximum number of contacts to return.
+        fields (tuple, optional): Public columns to select. Defaults to all.
+
+    Returns:
+        sqlalchemy.Select: Statement selecting `fields` of the matching
+        contacts, best first.
+    """
+    query = query.strip().lower()
+    if dialect == 'postgresql' and len(query) >= MIN_TRIGRAM_LENGTH:
+        return _postgresql_statement(query, limit, fields)
+    if dialect == 'sqlite':
+        return _sqlite_statement(query, limit, fields)
+    return _fallback_statement(query, limit, fields)
@@ -1,4 +1,37 @@
+import os
+import jwt
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+import limiter_storage  # registers the sqlitefile:// and redis+counter:// storages
+import auth.service
 
-limiter = Limiter(key_func=get_remote_address)
+
+def get_user_or_remote_address(request) -> str:
+    """
+    Rate limit key of a request: the user of a valid bearer token, else the client address.
+
+    Only the token signature and expiry are checked, no database lookup, so
+    the key costs a few microseconds per request.
+
+    Args:
+        request (Request): The HTTP request object.
+
+    Returns:
+        str: 'user:<subject>' or 'ip:<address>'.
+    """
+    scheme, _, token = request.headers.get('authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and token:
+        try:
+            payload = jwt.decode(token, auth.service.Service.SECRET_KEY, algorithms=[auth.service.Service.ALGORITHM])
+        except jwt.exceptions.InvalidTokenError:
+            pass
+        else:
+            if payload.get('sub'):
+                return f"user:{payload['sub']}"
+    return f'ip:{get_remote_address(request)}'
+
+
+KEY_FUNCS = {'ip': get_remote_address, 'user': get_user_or_remote_address}
+
+# Storage comes from RATELIMIT_STORAGE_URL (default memory://), read by slowapi itself
+limiter = Limiter(key_func=KEY_FUNCS[os.environ.get('RATELIMIT_KEY', 'ip')])
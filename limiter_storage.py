@@ -0,0 +1,145 @@
+"""
+Rate limit storages shared by every worker process, for `limiter_config`.
+
+slowapi keeps its counters in a `limits` storage chosen by URI. The default
+`memory://` is per process, so N workers allow N times the configured rate.
+Importing this module registers two shared alternatives:
+
+    sqlitefile:///var/run/contact_api/limits.db   workers on one host
+    redis+counter://localhost:6379/0              workers on any number of hosts
+
+Both count fixed windows, the strategy slowapi uses by default.
+"""
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+from limits.storage import Storage
+
+
+class SQLiteFileStorage(Storage):
+    """
+    Fixed-window counters in a local SQLite file opened by every worker.
+
+    Each hit is a single UPSERT ... RETURNING, atomic across processes. The
+    file runs in WAL mode without fsync: counters are cheap to lose on a
+    crash, not worth a disk flush per request.
+    """
+
+    STORAGE_SCHEME = ['sqlitefile']
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        self.path = urllib.parse.urlparse(uri).path or os.path.join(os.getcwd(), 'limits.db')
+        self._local = threading.local()
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS limits (key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL)'
+            )
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            self._local.connection = connection
+        return connection
+
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        now = time.time()
+        return self._connection().execute(
+            """
+            INSERT INTO limits (key, count, expires_at) VALUES (:key, :amount, :expires_at)
+            ON CONFLICT (key) DO UPDATE SET
+                count = CASE WHEN expires_at <= :now THEN :amount ELSE count + :amount END,
+                expires_at = CASE WHEN expires_at <= :now OR :elastic THEN :expires_at ELSE expires_at END
+            RETURNING count
+            """,
+            {'key': key, 'amount': amount, 'expires_at': now + expiry, 'now': now, 'elastic': elastic_expiry},
+        ).fetchone()[0]
+
+    def get(self, key: str) -> int:
+        row = self._connection().execute(
+            'SELECT count FROM limits WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> int:
+        row = self._connection().execute('SELECT expires_at FROM limits WHERE key = ?', (key,)).fetchone()
+        return int(row[0]) if row else int(time.time())
+
+    def check(self) -> bool:
+        try:
+            self._connection().execute('SELECT 1')
+        except sqlite3.Error:
+            return False
+        return True
+
+    def reset(self) -> int:
+        return self._connection().execute('DELETE FROM limits').rowcount
+
+    def clear(self, key: str) -> None:
+        self._connection().execute('DELETE FROM limits WHERE key = ?', (key,))
+
+
+class RedisCounterStorage(Storage):
+    """
+    Fixed-window counters in Redis, or anything speaking its protocol.
+
+    A hit is INCRBY and EXPIRE NX in one MULTI round trip; no Lua scripts,
+    so it also runs against Redis-compatible servers without scripting.
+    `client` may be passed in `storage_options`, otherwise one is built
+    from the URI with redis-py.
+    """
+
+    STORAGE_SCHEME = ['redis+counter']
+    PREFIX = 'ratelimit:'
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, client=None, **options):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(uri.replace('redis+counter://', 'redis://', 1))
+        self.client = client
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        import redis.exceptions
+        return redis.exceptions.RedisError
+
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        key = self.PREFIX + key
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.incrby(key, amount)
+        if elastic_expiry:
+            pipeline.expire(key, expiry)
+        else:
+            pipeline.expire(key, expiry, nx=True)
+        count, _ = pipeline.execute()
+        return int(count)
+
+    def get(self, key: str) -> int:
+        return int(self.client.get(self.PREFIX + key) or 0)
+
+    def get_expiry(self, key: str) -> int:
+        return int(time.time() + max(self.client.ttl(self.PREFIX + key), 0))
+
+    def check(self) -> bool:
+        try:
+            return bool(self.client.ping())
+        except self.base_exceptions:
+            return False
+
+    def reset(self) -> int:
+        keys = list(self.client.scan_iter(match=self.PREFIX + '*'))
+        return self.client.delete(*keys) if keys else 0
+
+    def clear(self, key: str) -> None:
+        self.client.delete(self.PREFIX + key)
@@ -1,51 +1,102 @@
-import uvicorn 
+import uvicorn
 import fastapi
-import contacts.routes
-import auth.routes
-from auth.service import Service
+import fastapi.responses
+import database
+import metrics
+import os
+from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from contextlib import asynccontextmanager
 from slowapi import  _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
-from limiter_config import limiter
 
 
 @asynccontextmanager
 async def lifespan(app: fastapi.FastAPI):
-    global limiter
+    await database.connect()
+    yield
+    await database.disconnect()
+
+
+origins = [
+    "http://localhost:4000"
+]
+
+
+async def database_pool():
+    """
+    Report connection pool usage of this worker.
+
+    Returns:
+        dict: Pool size, connections checked out and in overflow, and the
+        number of session checkouts with their average and maximum wait.
+    """
+    return database.pool_stats.snapshot()
+
+
+async def prometheus_metrics():
+    """
+    Report request latency and SQL histograms of this worker, by route template.
 
+    Returns:
+        PlainTextResponse: The histograms in the Prometheus text format.
+    """
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
+
+
+def create_app() -> fastapi.FastAPI:
+    """
+    Build the application.
+
+    The .env file is loaded here, once per process, before the route modules
+    are imported, since they read their settings at import time. The debug
+    routers are left out when DEBUG_ROUTES is off.
+
+    Returns:
+        fastapi.FastAPI: The configured application.
+    """
+    load_dotenv()
+    import contacts.routes
+    import auth.routes
+    from limiter_config import limiter
+
+    # Responses are declared with response models and rendered with orjson
+    app = fastapi.FastAPI(lifespan=lifespan, default_response_class=fastapi.responses.ORJSONResponse)
 
     app.state.limiter = limiter
     app.add_exception_handler(
         RateLimitExceeded, _rate_limit_exceeded_handler
     )
 
-    yield
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    # Outermost, so the timings include CORS and error handling
+    app.add_middleware(metrics.MetricsMiddleware)
 
-app = fastapi.FastAPI(lifespan=lifespan)
+    # app.include_router(contacts.routes.router, dependencies=[fastapi.Depends(Service.get_current_user)])
+    app.include_router(contacts.routes.router)
+    app.include_router(auth.routes.router)
 
-origins = [
-    "http://localhost:4000"
-]
+    if os.environ.get('DEBUG_ROUTES', 'true').lower() in ('1', 'true', 'yes', 'on'):
+        # app.include_router(contacts.routes.router_debug, dependencies=[fastapi.Depends(Service.get_current_user)])
+        app.include_router(contacts.routes.router_debug)
+        app.include_router(auth.routes.router_debug)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    app.add_api_route('/health/db', database_pool, methods=['GET'], tags=['health'])
+    app.add_api_route('/metrics', prometheus_metrics, methods=['GET'], tags=['health'], include_in_schema=False)
+    return app
 
-# app.include_router(contacts.routes.router, dependencies=[fastapi.Depends(Service.get_current_user)])
-app.include_router(contacts.routes.router)
-app.include_router(contacts.routes.router_debug)
-# app.include_router(contacts.routes.router_debug, dependencies=[fastapi.Depends(Service.get_current_user)])
 
-app.include_router(auth.routes.router)
-app.include_router(auth.routes.router_debug)
+app = create_app()
 
 if __name__ == '__main__':
     uvicorn.run(
         'main:app', host='0.0.0.0', port=8000, reload=True
-    )
\ No newline at end of file
+    )
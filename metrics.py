@@ -0,0 +1,153 @@
+"""
+Per-request timing and SQL instrumentation, exported as Server-Timing and Prometheus metrics.
+
+`MetricsMiddleware` opens a `RequestStats` for every HTTP request; the
+SQLAlchemy hooks in `database` add each statement's duration and row count
+to the stats of the request that ran it. The totals go back to the client
+in a Server-Timing header and into histograms labelled with the route
+template, served in the Prometheus text format at `/metrics`.
+
+Histograms are per process, like the other in-process state of the app;
+scrape every worker, or aggregate in Prometheus.
+"""
+import bisect
+import contextvars
+import time
+from collections import defaultdict
+
+# Route label of requests that matched no route, so scanners can't blow up cardinality
+UNMATCHED = '<unmatched>'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 250, 1000)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 100000)
+
+
+class RequestStats:
+    """
+    SQL totals of one request.
+    """
+
+    __slots__ = ('statements', 'db_time', 'rows')
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.rows = 0
+
+    def record_statement(self, duration: float, rows: int):
+        self.statements += 1
+        self.db_time += duration
+        self.rows += rows
+
+
+current = contextvars.ContextVar('request_stats', default=None)
+
+
+class Histogram:
+    """
+    A Prometheus histogram with a fixed label set.
+    """
+
+    def __init__(self, name: str, documentation: str, labels: tuple, buckets: tuple):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [count per bucket..., +Inf count, sum]
+        self._series = defaultdict(lambda: [0] * (len(buckets) + 1) + [0.0])
+
+    def observe(self, value: float, *label_values):
+        series = self._series[label_values]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for label_values, series in sorted(self._series.items()):
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series[-1]}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+LABELS = ('method', 'route', 'status')
+
+request_duration = Histogram(
+    'http_request_duration_seconds', 'Time from request to the end of the response body.', LABELS, LATENCY_BUCKETS
+)
+db_duration = Histogram(
+    'http_request_db_duration_seconds', 'Time spent executing SQL per request.', LABELS, LATENCY_BUCKETS
+)
+db_statements = Histogram(
+    'http_request_db_statements', 'SQL statements executed per request.', LABELS, COUNT_BUCKETS
+)
+db_rows = Histogram(
+    'http_request_db_rows', 'Rows returned or affected per request, as reported by the driver.', LABELS, ROW_BUCKETS
+)
+
+HISTOGRAMS = (request_duration, db_duration, db_statements, db_rows)
+
+
+def render() -> str:
+    """
+    Render every histogram in the Prometheus text exposition format.
+    """
+    return '\n'.join(line for histogram in HISTOGRAMS for line in histogram.render()) + '\n'
+
+
+def server_timing(total: float, stats: RequestStats) -> str:
+    return (
+        f'app;dur={total * 1000:.2f}, '
+        f'db;dur={stats.db_time * 1000:.2f};desc="{stats.statements} queries, {stats.rows} rows"'
+    )
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware measuring every HTTP request.
+
+    Server-Timing is added to the response headers, so it covers the time up
+    to the first byte; the histograms are updated once the body is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', server_timing(time.perf_counter() - started, stats).encode()))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current.reset(token)
+            route = scope.get('route')
+            labels = (scope['method'], route.path if route is not None else UNMATCHED, status_code)
+            request_duration.observe(time.perf_counter() - started, *labels)
+            db_duration.observe(stats.db_time, *labels)
+            db_statements.observe(stats.statements, *labels)
+            db_rows.observe(stats.rows, *labels)
@@ -0,0 +1,177 @@
+"""
+Production entry point: a pre-forking supervisor running one uvicorn worker per core.
+
+The app is imported once in the supervisor and inherited by every worker
+through fork, and the schema (DB_SCHEMA) is prepared once before forking
+instead of by each worker. Workers share one listening socket, run on uvloop
+and httptools, and are restarted if they die. SIGTERM or SIGINT drains them:
+they stop accepting, finish in-flight requests for up to GRACEFUL_TIMEOUT
+seconds and run the app shutdown.
+
+    python -m server [--workers N] [--host 0.0.0.0] [--port 8000]
+
+`python main.py` stays the development server with auto-reload.
+"""
+import argparse
+import asyncio
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+import contacts.cache
+import database
+import main
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    """
+    Open the listening socket shared by all workers.
+    """
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+async def prepare_database():
+    """
+    Apply DB_SCHEMA once, on a throwaway engine so no connection crosses the fork.
+    """
+    url = os.environ.get('DATABASE_URL', database.DEFAULT_DATABASE_URL)
+    engine = create_async_engine(url, poolclass=NullPool)
+    try:
+        async with engine.begin() as conn:
+            await database.prepare_schema(conn, os.environ.get('DB_SCHEMA', 'reset'))
+    finally:
+        await engine.dispose()
+
+
+def share_cache(workers: int):
+    """
+    Turn off the in-process contact cache when several workers serve requests.
+
+    A worker never sees the others' writes in its own memory, so it would
+    answer with old contacts and ETags, 304s included, until the TTL runs out.
+    """
+    if workers > 1 and isinstance(contacts.cache.cache.backend, contacts.cache.MemoryBackend):
+        contacts.cache.cache.backend = contacts.cache.NullBackend()
+        print('[server] contact cache off: memory:// is per worker, set CONTACT_CACHE_URL=redis://...', file=sys.stderr)
+
+
+def run_worker(sock: socket.socket, args):
+    # The supervisor's handlers must not run in the worker; uvicorn installs its own
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+        signal.signal(signum, signal.SIG_DFL)
+
+    config = uvicorn.Config(
+        main.app,
+        loop='uvloop',
+        http='httptools',
+        lifespan='on',
+        backlog=args.backlog,
+        timeout_keep_alive=args.keepalive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        proxy_headers=True,
+        access_log=args.access_log,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    """
+    Fork and babysit the workers.
+    """
+
+    def __init__(self, sock: socket.socket, args):
+        self.sock = sock
+        self.args = args
+        self.workers = set()
+        self.stopping = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(self.sock, self.args)
+            finally:
+                os._exit(0)
+        self.workers.add(pid)
+
+    def stop(self, signum, frame):
+        self.stopping = True
+        for pid in self.workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def reap(self) -> list:
+        exited = []
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                break
+            if pid == 0:
+                break
+            self.workers.discard(pid)
+            exited.append((pid, status))
+        return exited
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        # Objects created so far are shared copy-on-write; keep the collector off them
+        gc.freeze()
+        for _ in range(self.args.workers):
+            self.spawn()
+        print(f'[server] {self.args.workers} workers on {self.args.host}:{self.args.port}', file=sys.stderr)
+
+        while not self.stopping:
+            for pid, status in self.reap():
+                if not self.stopping:
+                    print(f'[server] worker {pid} exited ({status}), restarting', file=sys.stderr)
+                    self.spawn()
+            time.sleep(0.5)
+
+        deadline = time.monotonic() + self.args.graceful_timeout + 5
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in self.workers:
+            os.kill(pid, signal.SIGKILL)
+        return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run the API with one worker per CPU core.')
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1)))
+    parser.add_argument('--backlog', type=int, default=int(os.environ.get('BACKLOG', 2048)))
+    parser.add_argument('--keepalive', type=int, default=int(os.environ.get('KEEPALIVE', 30)),
+                        help='seconds to keep idle connections, above the load balancer idle timeout')
+    parser.add_argument('--graceful-timeout', type=int, default=int(os.environ.get('GRACEFUL_TIMEOUT', 30)))
+    parser.add_argument('--access-log', action='store_true')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if os.environ.get('DB_SCHEMA', 'reset') != 'none':
+        asyncio.run(prepare_database())
+        os.environ['DB_SCHEMA'] = 'none'
+    share_cache(args.workers)
+    sys.exit(Supervisor(bind_socket(args.host, args.port, args.backlog), args).run())
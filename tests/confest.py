@@ -5,16 +5,21 @@ import pytest
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
 
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) 
 #this is to include backend dir in sys.path so that we can import from db,main.py
 
+import database
 from database import Base
 from database import get_db
 from contacts.routes import router
+from limiter_config import limiter
+import contacts.cache
+import asyncio
 
 
 def start_application():
@@ -29,7 +34,23 @@ engine = create_engine(
 )
 # Use connect_args parameter only with sqlite
 
-SessionTesting = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# The app talks to the same file through aiosqlite. NullPool because every
+# TestClient runs its own event loop and connections can't outlive it.
+async_engine = create_async_engine("sqlite+aiosqlite:///./test_db.db", poolclass=NullPool)
+
+SessionTesting = async_sessionmaker(async_engine, expire_on_commit=False)
+
+
+@pytest.fixture(scope="function")
+def tables():
+    """
+    Create the tables for tests that use sessions without the app.
+    """
+    Base.metadata.create_all(engine)
+    database.DBsession = SessionTesting  # Sessions opened outside of requests.
+    yield
+    database.DBsession = None
+    Base.metadata.drop_all(engine)
 
 
 @pytest.fixture(scope="function")
@@ -38,36 +59,27 @@ def app() -> Generator[FastAPI, Any, None]:
     Create a fresh database on each test case.
     """
     Base.metadata.create_all(engine)  # Create the tables.
+    database.DBsession = SessionTesting  # Sessions opened outside of requests.
+    limiter.reset()  # Rate limit counters are process-wide.
+    asyncio.run(contacts.cache.cache.clear())  # So is the contact cache.
     _app = start_application()
     yield _app
+    database.DBsession = None
     Base.metadata.drop_all(engine)
 
 
-@pytest.fixture(scope="function")
-def db_session(app: FastAPI) -> Generator[SessionTesting, Any, None]:
-    connection = engine.connect()
-    transaction = connection.begin()
-    session = SessionTesting(bind=connection)
-    yield session  # use the session in tests.
-    session.close()
-    transaction.rollback()
-    connection.close()
-
-
 @pytest.fixture(scope="function")
 def client(
-    app: FastAPI, db_session: SessionTesting
+    app: FastAPI
 ) -> Generator[TestClient, Any, None]:
     """
-    Create a new FastAPI TestClient that uses the `db_session` fixture to override
-    the `get_db` dependency that is injected into routes.
+    Create a new FastAPI TestClient whose `get_db` dependency yields sessions
+    on the test database.
     """
 
-    def _get_test_db():
-        try:
-            yield db_session
-        finally:
-            pass
+    async def _get_test_db():
+        async with SessionTesting() as session:
+            yield session
 
     app.dependency_overrides[get_db] = _get_test_db
     with TestClient(app) as client:
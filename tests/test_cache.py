@@ -0,0 +1,267 @@
+import asyncio
+import fnmatch
+
+from tests.confest import client, app
+import contacts.cache
+
+
+class FakeRedis:
+    """
+    The few asyncio Redis calls RedisBackend makes, in a dict.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.expiries = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def mget(self, *keys):
+        return [self.data.get(key) for key in keys]
+
+    async def set(self, key, value, px=None):
+        self.data[key] = value
+        self.expiries[key] = px
+
+    async def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+        return int(self.data[key])
+
+    async def expire(self, key, seconds):
+        if key in self.data:
+            self.expiries[key] = seconds * 1000
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def scan_iter(self, match):
+        for key in list(self.data):
+            if fnmatch.fnmatch(key, match):
+                yield key
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """
+    Queues FakeRedis calls and runs them in order on execute.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((getattr(self.client, name), args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        return [await call(*args, **kwargs) for call, args, kwargs in self.calls]
+
+
+def test_concurrent_misses_load_once():
+    cache = contacts.cache.ReadThroughCache(contacts.cache.MemoryBackend(10), ttl=30)
+    loads = 0
+
+    async def load():
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.01)
+        return {'value': 1}
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_load('key', load) for _ in range(20)))
+
+    results = asyncio.run(scenario())
+    assert loads == 1
+    assert results == [{'value': 1}] * 20
+    assert cache.stats()['in_flight'] == 0
+
+
+def test_failed_load_is_shared_and_not_cached():
+    cache = contacts.cache.ReadThroughCache(contacts.cache.MemoryBackend(10), ttl=30)
+
+    async def load():
+        await asyncio.sleep(0.01)
+        raise RuntimeError('down')
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_load('key', load) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert asyncio.run(cache.backend.get('key')) is None
+
+
+def test_cancelled_load_hands_over_to_waiters():
+    cache = contacts.cache.ReadThroughCache(contacts.cache.MemoryBackend(10), ttl=30)
+    loads = 0
+
+    async def load():
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.01)
+        return {'value': loads}
+
+    async def scenario():
+        leader = asyncio.ensure_future(cache.get_or_load('key', load))
+        await asyncio.sleep(0)
+        waiters = [asyncio.ensure_future(cache.get_or_load('key', load)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await asyncio.gather(*waiters), leader.cancelled()
+
+    results, cancelled = asyncio.run(scenario())
+    assert cancelled
+    assert results == [{'value': 2}] * 3
+    assert loads == 2
+    assert cache.stats()['in_flight'] == 0
+
+
+def test_load_overlapping_invalidation_is_not_stored():
+    cache = contacts.cache.ReadThroughCache(contacts.cache.MemoryBackend(10), ttl=30)
+
+    async def scenario():
+        async def load():
+            await cache.invalidate('key')
+            return {'value': 'stale'}
+
+        assert await cache.get_or_load('key', load) == {'value': 'stale'}
+        return await cache.backend.get('key')
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_memory_backend_evicts_least_recently_used_and_expired():
+    backend = contacts.cache.MemoryBackend(2)
+
+    async def scenario():
+        await backend.set('a', 1, 30)
+        await backend.set('b', 2, 30)
+        await backend.get('a')
+        await backend.set('c', 3, 30)
+        evicted = [await backend.get(key) for key in ('a', 'b', 'c')]
+        await backend.set('expired', 4, -1)
+        return evicted, await backend.get('expired')
+
+    assert asyncio.run(scenario()) == ([1, None, 3], None)
+
+
+def test_redis_backend():
+    client = FakeRedis()
+    backend = contacts.cache.RedisBackend(client)
+
+    async def scenario():
+        await backend.set('contact:1', {'id': 1}, 1.5)
+        await backend.set('version', {'version': 3}, 30)
+        client.data['unrelated'] = b'1'
+        value = await backend.get('contact:1')
+        await backend.delete('contact:1')
+        deleted = await backend.get('contact:1')
+        await backend.clear()
+        return value, deleted
+
+    assert asyncio.run(scenario()) == ({'id': 1}, None)
+    assert client.expiries['contact-cache:contact:1'] == 1500
+    assert not [key for key in client.data if key.startswith(contacts.cache.RedisBackend.PREFIX)]
+    assert 'unrelated' in client.data
+
+
+def test_load_overlapping_another_workers_invalidation_is_not_served():
+    store = FakeRedis()
+    reader = contacts.cache.ReadThroughCache(contacts.cache.RedisBackend(store), ttl=30)
+    writer = contacts.cache.ReadThroughCache(contacts.cache.RedisBackend(store), ttl=30)
+
+    async def scenario():
+        async def load():
+            # Another worker commits and invalidates while this one reads
+            await writer.invalidate('contact:1')
+            return {'value': 'stale'}
+
+        assert await reader.get_or_load('contact:1', load) == {'value': 'stale'}
+        stale = await reader.backend.get('contact:1'), await writer.backend.get('contact:1')
+
+        async def reload():
+            return {'value': 'fresh'}
+
+        await reader.get_or_load('contact:1', reload)
+        fresh = await writer.backend.get('contact:1')
+
+        async def load_during_clear():
+            await writer.clear()
+            return {'value': 'stale'}
+
+        await reader.get_or_load('contact:2', load_during_clear)
+        return stale, fresh, await writer.backend.get('contact:2')
+
+    assert asyncio.run(scenario()) == ((None, None), {'value': 'fresh'}, None)
+
+
+def test_settings_are_read_on_first_use(monkeypatch):
+    cache = contacts.cache.ReadThroughCache()
+    monkeypatch.setenv('CONTACT_CACHE_SIZE', '3')
+    monkeypatch.setenv('CONTACT_CACHE_TTL', '5')
+    assert cache.backend.maxsize == 3
+    assert cache.ttl == 5
+
+
+def test_memory_cache_is_off_with_several_workers(monkeypatch):
+    import server
+    monkeypatch.setattr(contacts.cache.cache, 'backend', contacts.cache.MemoryBackend(10))
+    server.share_cache(1)
+    assert isinstance(contacts.cache.cache.backend, contacts.cache.MemoryBackend)
+    server.share_cache(4)
+    assert isinstance(contacts.cache.cache.backend, contacts.cache.NullBackend)
+
+    redis = contacts.cache.RedisBackend(FakeRedis())
+    monkeypatch.setattr(contacts.cache.cache, 'backend', redis)
+    server.share_cache(4)
+    assert contacts.cache.cache.backend is redis
+
+
+def test_update_invalidates_cached_contact(client):
+    payload = {
+        "firstname": "Cache",
+        "lastname": "Me",
+        "email": "cache@example.com",
+        "phone": "+14155552671",
+        "birthday": "1990-05-06"
+    }
+    client.post('/contacts', json=payload)
+    contact_id = client.get('/contacts').json()['items'][0]['id']
+
+    assert client.get(f'/contacts/{contact_id}').json()['firstname'] == 'Cache'
+    assert client.get('/contacts').json()['items'][0]['firstname'] == 'Cache'
+    hits = contacts.cache.cache.hits
+    assert client.get(f'/contacts/{contact_id}').json()['firstname'] == 'Cache'
+    assert contacts.cache.cache.hits > hits
+
+    client.put(f'/contacts/{contact_id}', json={**payload, 'firstname': 'Fresh'})
+    assert client.get(f'/contacts/{contact_id}').json()['firstname'] == 'Fresh'
+    assert client.get('/contacts').json()['items'][0]['firstname'] == 'Fresh'
+
+
+def test_partial_read_selects_only_its_columns(client):
+    client.post('/contacts', json={
+        "firstname": "Partial",
+        "lastname": "Read",
+        "email": "partial@example.com",
+        "phone": "+14155552672",
+        "birthday": "1990-05-07"
+    })
+    contact_id = client.get('/contacts').json()['items'][0]['id']
+    cached = contacts.cache.key('contact', contact_id)
+
+    assert client.get(f'/contacts/{contact_id}?fields=firstname').json() == {'id': contact_id, 'firstname': 'Partial'}
+    assert asyncio.run(contacts.cache.cache.backend.get(cached)) is None
+
+    client.get(f'/contacts/{contact_id}')
+    assert asyncio.run(contacts.cache.cache.backend.get(cached))['row']['lastname'] == 'Read'
+    hits = contacts.cache.cache.hits
+    assert client.get(f'/contacts/{contact_id}?fields=lastname').json() == {'id': contact_id, 'lastname': 'Read'}
+    assert contacts.cache.cache.hits == hits + 1
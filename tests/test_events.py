@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from tests.confest import tables, SessionTesting
+import contacts.models
+import contacts.changes
+import contacts.events
+
+
+async def create_contact(index: int, commit: bool = True) -> int:
+    async with SessionTesting() as db:
+        contact = contacts.models.Contact(
+            firstname='Stream', lastname=f'Contact{index}', email=f'stream{index}@example.com',
+            phone=f'+1415555270{index}', birthday='1990-03-04'
+        )
+        db.add(contact)
+        await db.flush()
+        await contacts.changes.record(db, contacts.changes.INSERT, [contact.id])
+        if commit:
+            await db.commit()
+        else:
+            await db.rollback()
+        return contact.id
+
+
+def test_events_published_on_commit_only(tables):
+    async def scenario():
+        stream = contacts.events.event_stream(heartbeat=0.05)
+        assert await anext(stream) == ': connected\n\n'
+
+        await create_contact(0, commit=False)
+        assert await anext(stream) == ': keepalive\n\n'
+
+        contact_id = await create_contact(1)
+        message = await anext(stream)
+        await stream.aclose()
+        return contact_id, message
+
+    contact_id, message = asyncio.run(scenario())
+
+    assert message.startswith('id: 1\nevent: insert\n')
+    assert f'"contact_id": {contact_id}' in message
+    assert not contacts.events.broker.subscriptions
+
+
+def test_events_replayed_after_last_event_id(tables):
+    async def scenario():
+        for index in range(3):
+            await create_contact(index)
+
+        stream = contacts.events.event_stream(last_event_id=1, heartbeat=0.05)
+        messages = [await anext(stream) for _ in range(3)]
+        await stream.aclose()
+        return messages
+
+    messages = asyncio.run(scenario())
+
+    assert [message.split('\n')[0] for message in messages[1:]] == ['id: 2', 'id: 3']
+
+
+def test_slow_subscriber_dropped():
+    broker = contacts.events.Broker(queue_size=1)
+    slow = broker.subscribe()
+
+    broker.publish([{'seq': 1}, {'seq': 2}])
+
+    assert slow.dropped
+    assert broker.stats() == {'subscribers': 0, 'published': 2, 'dropped_subscribers': 1}
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+import sqlalchemy
+
+from tests.confest import tables, async_engine, SessionTesting
+import contacts.changes
+import contacts.generate
+import contacts.schemas
+
+
+def test_rows_depend_only_on_seed_and_number():
+    rows = contacts.generate.generate_rows(7, 0, 1000)
+    assert rows == contacts.generate.generate_rows(7, 0, 400) + contacts.generate.generate_rows(7, 400, 600)
+    assert rows != contacts.generate.generate_rows(8, 0, 1000)
+
+    # Valid for the API, and stored the same way as rows posted through it
+    for row in rows[:200] + contacts.generate.generate_rows(7, contacts.generate.MAX_ROWS - 200, 200):
+        values = dict(zip(contacts.generate.COLUMNS, row))
+        assert contacts.schemas.PostContact(**values).model_dump(mode='json') == values
+
+
+def test_emails_and_phones_are_unique():
+    numbers = list(range(0, 50_000)) + [contacts.generate.NUMBERS_PER_AREA * 3 + 17, contacts.generate.MAX_ROWS - 1]
+    rows = [row for number in numbers for row in contacts.generate.generate_rows(1, number, 1)]
+    assert len({row[2] for row in rows}) == len({row[3] for row in rows}) == len(numbers)
+
+    with pytest.raises(ValueError):
+        contacts.generate.generate_rows(1, contacts.generate.MAX_ROWS, 1)
+
+
+def test_generate_loads_batches_in_parallel(tables):
+    loaded = []
+    asyncio.run(contacts.generate.generate(
+        async_engine, 2500, seed=3, offset=10, batch_size=1000, workers=2, progress=loaded.append
+    ))
+    assert loaded == [1000, 2000, 2500]
+
+    async def check():
+        async with SessionTesting() as db:
+            emails = (await db.scalars(sqlalchemy.select(contacts.models.Contact.email))).all()
+            version, _ = await contacts.changes.collection_version(db)
+        return emails, version
+
+    emails, version = asyncio.run(check())
+    assert sorted(emails) == sorted(row[2] for row in contacts.generate.generate_rows(3, 10, 2500))
+    assert version == 1
@@ -0,0 +1,120 @@
+import time
+
+import jwt
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+from starlette.requests import Request
+
+import auth.service
+import limiter_config
+import limiter_storage
+
+
+class FakeRedis:
+    """
+    The few Redis commands `RedisCounterStorage` uses, in process.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.expiries = {}
+
+    def _expire_due(self):
+        now = time.time()
+        for key in [key for key, expires_at in self.expiries.items() if expires_at <= now]:
+            self.values.pop(key, None)
+            self.expiries.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def incrby(self, key, amount):
+        self._expire_due()
+        self.values[key] = self.values.get(key, 0) + amount
+        return self.values[key]
+
+    def expire(self, key, seconds, nx=False):
+        if nx and key in self.expiries:
+            return False
+        self.expiries[key] = time.time() + seconds
+        return True
+
+    def get(self, key):
+        self._expire_due()
+        return self.values.get(key)
+
+    def ttl(self, key):
+        return int(self.expiries[key] - time.time()) if key in self.expiries else -2
+
+    def ping(self):
+        return True
+
+    def scan_iter(self, match):
+        return [key for key in self.values if key.startswith(match.rstrip('*'))]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+            self.expiries.pop(key, None)
+        return len(keys)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+def request_with(headers=None):
+    return Request({
+        'type': 'http',
+        'headers': [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        'client': ('10.0.0.1', 1234),
+    })
+
+
+def test_sqlite_file_storage_shared_between_workers(tmp_path):
+    uri = f'sqlitefile://{tmp_path}/limits.db'
+    # Two storages on one file stand in for two worker processes
+    workers = [FixedWindowRateLimiter(storage_from_string(uri)) for _ in range(2)]
+    limit = parse('3/minute')
+
+    assert [workers[i % 2].hit(limit, 'client') for i in range(4)] == [True, True, True, False]
+    assert workers[0].storage.get(limit.key_for("client")) == 4
+
+
+def test_sqlite_file_storage_window_expires(tmp_path):
+    storage = limiter_storage.SQLiteFileStorage(f'sqlitefile://{tmp_path}/limits.db')
+
+    assert storage.incr('key', expiry=1) == 1
+    assert storage.incr('key', expiry=1) == 2
+    time.sleep(1.1)
+    assert storage.get('key') == 0
+    assert storage.incr('key', expiry=1) == 1
+
+
+def test_redis_counter_storage():
+    storage = storage_from_string('redis+counter://localhost:6379/0', client=FakeRedis())
+    limiter = FixedWindowRateLimiter(storage)
+    limit = parse('2/minute')
+
+    assert [limiter.hit(limit, 'client') for _ in range(3)] == [True, True, False]
+    assert limiter.hit(limit, 'other')
+    assert storage.reset() == 2
+
+
+def test_key_func_prefers_authenticated_user(monkeypatch):
+    monkeypatch.setattr(auth.service.Service, 'SECRET_KEY', 'test-secret-key-of-at-least-32-bytes')
+    token = jwt.encode({'sub': 'alice@example.com'}, 'test-secret-key-of-at-least-32-bytes', 'HS256')
+    forged = jwt.encode({'sub': 'alice@example.com'}, 'other-secret-key-of-at-least-32-bytes', 'HS256')
+
+    assert limiter_config.get_user_or_remote_address(request_with({'Authorization': f'Bearer {token}'})) == 'user:alice@example.com'
+    assert limiter_config.get_user_or_remote_address(request_with({'Authorization': f'Bearer {forged}'})) == 'ip:10.0.0.1'
+    assert limiter_config.get_user_or_remote_address(request_with()) == 'ip:10.0.0.1'
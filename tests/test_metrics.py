@@ -0,0 +1,132 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from tests.confest import app, SessionTesting
+from database import get_db
+import main
+import metrics
+
+
+@pytest.fixture(scope="function")
+def metrics_client(app):
+    app.add_middleware(metrics.MetricsMiddleware)
+    app.add_api_route('/metrics', main.prometheus_metrics, methods=['GET'])
+
+    async def _get_test_db():
+        async with SessionTesting() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = _get_test_db
+    with TestClient(app) as client:
+        yield client
+
+
+def test_server_timing_counts_queries(metrics_client):
+    metrics_client.post("/contacts", json={
+        "firstname": "Timed",
+        "lastname": "Contact",
+        "email": "timed@example.com",
+        "phone": "+14155552695",
+        "birthday": "1990-03-04"
+    })
+
+    response = metrics_client.get("/contacts")
+    app_timing, db_timing = response.headers["server-timing"].split(", db;")
+    assert app_timing.startswith("app;dur=")
+    # Collection version, then the page
+    assert db_timing.endswith('desc="2 queries, 0 rows"')
+
+
+def test_metrics_labelled_by_route_template(metrics_client):
+    metrics_client.get("/contacts/query/somebody")
+    metrics_client.get("/no/such/route")
+
+    text = metrics_client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{method="GET",route="/contacts/query/{query}",status="200"} 1' in text
+    assert 'http_request_db_statements_bucket{method="GET",route="/contacts/query/{query}",status="200",le="1"} 1' in text
+    assert 'route="<unmatched>",status="404"' in text
+    assert 'somebody' not in text
+
+
+def write_timing(response) -> tuple[float, int]:
+    """
+    Total milliseconds and SQL statement count of a response's Server-Timing.
+    """
+    app_timing, db_timing = response.headers["server-timing"].split(", db;")
+    statements = int(db_timing.split('desc="')[1].split(" queries")[0])
+    return float(app_timing.removeprefix("app;dur=")), statements
+
+
+def test_writes_take_one_statement_plus_change_bookkeeping(metrics_client):
+    contact = {
+        "firstname": "Single",
+        "lastname": "Trip",
+        "email": "single@example.com",
+        "phone": "+14155552696",
+        "birthday": "1990-03-04"
+    }
+    created = metrics_client.post("/contacts", json=contact)
+    contact_id = created.json()["id"]
+    writes = [
+        created,
+        metrics_client.put(f"/contacts/{contact_id}", json={**contact, "lastname": "Put"}),
+        metrics_client.patch(f"/contacts/{contact_id}", json={"lastname": "Patched"}),
+    ]
+    # One statement writes the contact, then one bumps the collection version and one logs the change
+    assert [write_timing(response)[1] for response in writes] == [3, 3, 3]
+    # Generous: SQLite in CI, but an extra round trip per row would blow it
+    assert max(write_timing(response)[0] for response in writes) < 1000
+
+    # Failed writes stop after the statement
+    duplicate = metrics_client.post("/contacts", json=contact)
+    missing = metrics_client.patch("/contacts/999", json={"lastname": "Nobody"})
+    assert (duplicate.status_code, missing.status_code) == (409, 404)
+    assert write_timing(duplicate)[1] == write_timing(missing)[1] == 1
+
+
+def test_pool_times_request_checkouts(monkeypatch):
+    import asyncio
+    import sqlalchemy
+    from sqlalchemy.ext.asyncio import create_async_engine
+    import database
+
+    monkeypatch.setattr(database, "pool_stats", database.PoolStats())
+
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=database.TimedPool)
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(sqlalchemy.text("select 1"))
+            token = metrics.current.set(metrics.RequestStats())
+            try:
+                async with engine.connect() as conn:
+                    await conn.execute(sqlalchemy.text("select 1"))
+            finally:
+                metrics.current.reset(token)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())
+    assert database.pool_stats.checkouts == 1
+
+
+def test_failed_statement_leaves_no_timing_behind():
+    import asyncio
+    import sqlalchemy
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        stats = metrics.RequestStats()
+        token = metrics.current.set(stats)
+        try:
+            async with engine.connect() as conn:
+                with pytest.raises(sqlalchemy.exc.OperationalError):
+                    await conn.execute(sqlalchemy.text("select * from missing"))
+                await conn.execute(sqlalchemy.text("select 1"))
+                return stats.statements, dict(conn.info)
+        finally:
+            metrics.current.reset(token)
+            await engine.dispose()
+
+    assert asyncio.run(scenario()) == (1, {})
@@ -0,0 +1,91 @@
+import asyncio
+import socket
+from datetime import datetime
+
+import pytest
+import sqlalchemy
+from aiosmtpd.controller import Controller
+
+from tests.confest import tables, SessionTesting
+import auth.models
+from auth.outbox import OutboxWorker, SMTPConnection
+
+
+class Inbox:
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return '250 OK'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="function")
+def smtp_server():
+    inbox = Inbox()
+    controller = Controller(inbox, hostname='127.0.0.1', port=free_port())
+    controller.start()
+    yield inbox, controller.port
+    controller.stop()
+
+
+async def queue(*recipients):
+    async with SessionTesting() as db:
+        db.add_all([auth.models.EmailOutbox(recipient=recipient, email_token='token') for recipient in recipients])
+        await db.commit()
+
+
+async def outbox_rows():
+    async with SessionTesting() as db:
+        return (await db.scalars(sqlalchemy.select(auth.models.EmailOutbox).order_by(auth.models.EmailOutbox.id))).all()
+
+
+def test_outbox_sends_batch_over_one_connection(tables, smtp_server):
+    inbox, port = smtp_server
+    worker = OutboxWorker(SMTPConnection('127.0.0.1', port, use_ssl=False), 'noreply@example.com',
+                          session_factory=SessionTesting, batch_size=10)
+
+    async def scenario():
+        await queue('a@example.com', 'b@example.com', 'c@example.com')
+        assert await worker.drain_once() == 3
+        assert await worker.drain_once() == 0
+        return await outbox_rows()
+
+    rows = asyncio.run(scenario())
+    worker.smtp.close()
+
+    assert [row.status for row in rows] == ['sent', 'sent', 'sent']
+    assert sorted(message.rcpt_tos[0] for message in inbox.messages) == ['a@example.com', 'b@example.com', 'c@example.com']
+    assert b'/auth/email_verification/token' in inbox.messages[0].content
+    assert inbox.connections == 1
+
+
+def test_outbox_retries_with_backoff(tables):
+    worker = OutboxWorker(SMTPConnection('127.0.0.1', free_port(), use_ssl=False, timeout=1), 'noreply@example.com',
+                          session_factory=SessionTesting, backoff=60)
+
+    async def scenario():
+        await queue('a@example.com')
+        assert await worker.drain_once() == 1
+        # Not due again before the backoff expires
+        assert await worker.drain_once() == 0
+        return await outbox_rows()
+
+    [row] = asyncio.run(scenario())
+
+    assert row.status == 'pending'
+    assert row.attempts == 1
+    assert row.last_error
+    assert row.next_attempt_at > datetime.utcnow()
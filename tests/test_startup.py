@@ -0,0 +1,17 @@
+import os
+
+from benchmarks.startup import import_times, report
+
+# Imported on first use only; none of them may come back at startup
+LAZY_MODULES = ('faker', 'cloudinary', 'sqlalchemy_file')
+
+# Generous, so only a real regression (e.g. a heavy eager import) trips it
+IMPORT_BUDGET_MS = float(os.environ.get('STARTUP_IMPORT_BUDGET_MS', 5000))
+
+
+def test_app_import_time():
+    times = import_times('main')
+    total_ms = times['main'][1] / 1000
+
+    assert not [module for module in LAZY_MODULES if module in times], report(times)
+    assert total_ms < IMPORT_BUDGET_MS, f'import main took {total_ms:.0f} ms\n' + report(times)
@@ -18,7 +18,186 @@ def test_create_contact(client):
 def test_get_all_contacts(client):
     response = client.get("/contacts")
     assert response.status_code == 200
-    assert isinstance(response.json(), list)
+    assert isinstance(response.json()["items"], list)
+
+def test_get_all_contacts_pagination(client):
+    for i in range(3):
+        client.post("/contacts", json={
+            "firstname": "Page",
+            "lastname": f"Contact{i}",
+            "email": f"page{i}@example.com",
+            "phone": f"+1415555267{i}",
+            "birthday": "1990-01-01"
+        })
+
+    first = client.get("/contacts", params={"limit": 2}).json()
+    assert len(first["items"]) == 2
+    assert first["next_cursor"] is not None
+
+    second = client.get("/contacts", params={"limit": 2, "after": first["next_cursor"]}).json()
+    assert len(second["items"]) == 1
+    assert second["next_cursor"] is None
+    assert second["items"][0]["id"] > first["items"][-1]["id"]
+
+def test_get_all_contacts_response_fields(client):
+    client.post("/contacts", json={
+        "firstname": "Field",
+        "lastname": "Check",
+        "email": "fieldcheck@example.com",
+        "phone": "+14155552699",
+        "birthday": "1990-03-04"
+    })
+
+    [item] = client.get("/contacts").json()["items"]
+    assert set(item) == {"id", "firstname", "lastname", "email", "phone", "birthday", "avatar"}
+    assert item["birthday"] == "1990-03-04"
+
+def test_get_all_contacts_fields(client):
+    client.post("/contacts", json={
+        "firstname": "Slim",
+        "lastname": "Fields",
+        "email": "slimfields@example.com",
+        "phone": "+14155552698",
+        "birthday": "1990-03-04"
+    })
+
+    [item] = client.get("/contacts", params={"fields": "firstname,lastname"}).json()["items"]
+    assert item == {"id": item["id"], "firstname": "Slim", "lastname": "Fields"}
+
+    [item] = client.get("/contacts/query/slim", params={"fields": "email"}).json()
+    assert set(item) == {"id", "email"}
+
+    response = client.get("/contacts/export", params={"format": "csv", "fields": "id,email"})
+    assert response.text.splitlines()[0] == "id,email"
+
+    response = client.get("/contacts", params={"fields": "hashed_password"})
+    assert response.status_code == 400
+
+def test_get_all_contacts_etag(client):
+    client.post("/contacts", json={
+        "firstname": "Cached",
+        "lastname": "Contact",
+        "email": "cached@example.com",
+        "phone": "+14155552697",
+        "birthday": "1990-03-04"
+    })
+
+    first = client.get("/contacts")
+    etag = first.headers["etag"]
+    assert first.headers["last-modified"]
+
+    response = client.get("/contacts", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # Another page shape is another representation
+    assert client.get("/contacts", params={"fields": "id"}).headers["etag"] != etag
+
+    client.post("/contacts", json={
+        "firstname": "Changed",
+        "lastname": "Contact",
+        "email": "changed@example.com",
+        "phone": "+14155552696",
+        "birthday": "1990-03-04"
+    })
+    response = client.get("/contacts", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+def test_get_contact_changes(client):
+    for i in range(2):
+        client.post("/contacts", json={
+            "firstname": "Feed",
+            "lastname": f"Contact{i}",
+            "email": f"feed{i}@example.com",
+            "phone": f"+1415555269{i}",
+            "birthday": "1990-03-04"
+        })
+
+    first = client.get("/contacts/changes", params={"limit": 1}).json()
+    assert first["has_more"] is True
+    [change] = first["changes"]
+    assert change["operation"] == "insert"
+    assert change["contact"]["email"] == "feed0@example.com"
+
+    second = client.get("/contacts/changes", params={"since": first["next_since"]}).json()
+    assert [change["contact"]["email"] for change in second["changes"]] == ["feed1@example.com"]
+    assert second["has_more"] is False
+
+    caught_up = client.get("/contacts/changes", params={"since": second["next_since"]}).json()
+    assert caught_up == {"changes": [], "next_since": second["next_since"], "has_more": False}
+
+    response = client.get("/contacts/changes", params={"since": 1000})
+    assert response.status_code == 410
+
+def test_get_all_contacts_invalid_cursor(client):
+    response = client.get("/contacts", params={"after": "not-a-cursor"})
+    assert response.status_code == 400
+
+def test_post_contacts_bulk(client):
+    client.post("/contacts", json={
+        "firstname": "Existing",
+        "lastname": "Contact",
+        "email": "existing@example.com",
+        "phone": "+14155552600",
+        "birthday": "1990-01-01"
+    })
+    rows = [
+        {"firstname": "Bulk", "lastname": "One", "email": "bulk1@example.com", "phone": "+14155552601", "birthday": "1990-01-01"},
+        {"firstname": "Bulk", "lastname": "Two", "email": "bulk2@example.com", "phone": "+14155552602", "birthday": "1990-01-02"},
+        {"firstname": "Bulk", "lastname": "Again", "email": "bulk1@example.com", "phone": "+14155552603", "birthday": "1990-01-03"},
+        {"firstname": "Bulk", "lastname": "Taken", "email": "taken@example.com", "phone": "+14155552600", "birthday": "1990-01-04"},
+        {"firstname": "Bulk", "lastname": "Invalid", "email": "not-an-email", "phone": "+14155552605", "birthday": "1990-01-05"},
+    ]
+
+    response = client.post("/contacts/bulk", json=rows)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["conflicts"], body["invalid"]) == (2, 2, 1)
+    assert [result["status"] for result in body["results"]] == ["created", "created", "conflict", "conflict", "invalid"]
+    assert "phone" in body["results"][3]["detail"]
+
+    ndjson = "\n".join(json.dumps(row) for row in [
+        {"firstname": "Nd", "lastname": "Json", "email": "ndjson@example.com", "phone": "+14155552606", "birthday": "1990-01-06"},
+    ])
+    response = client.post("/contacts/bulk", content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+    assert response.json()["created"] == 1
+
+def test_post_contacts_import(client):
+    csv_file = (
+        "firstname,lastname,email,phone,birthday\n"
+        "Ada,Lovelace,ada@example.com,+14155552610,1815-12-10\n"
+        "Ada,Again,ada@example.com,+14155552611,1815-12-10\n"
+        "Bad,Row,not-an-email,+14155552612,1815-12-10\n"
+    )
+    response = client.post("/contacts/import", files={"file": ("contacts.csv", csv_file, "text/csv")})
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["processed"], report["created"], report["conflicts"], report["invalid"]) == (3, 1, 1, 1)
+    assert sorted(row["index"] for row in report["rejected"]) == [1, 2]
+
+    vcard_file = (
+        "BEGIN:VCARD\r\nVERSION:3.0\r\nN:Hopper;Grace;;;\r\nEMAIL;TYPE=work:grace@example.com\r\n"
+        "TEL;TYPE=cell:+14155552613\r\nBDAY:19061209\r\nEND:VCARD\r\n"
+    )
+    response = client.post("/contacts/import", files={"file": ("contacts.vcf", vcard_file, "text/vcard")})
+    assert response.json()["created"] == 1
+
+def test_export_contacts(client):
+    client.post("/contacts/bulk", json=[
+        {"firstname": "Export", "lastname": str(i), "email": f"export{i}@example.com", "phone": f"+1415555262{i}", "birthday": "1990-01-01"}
+        for i in range(3)
+    ])
+
+    response = client.get("/contacts/export")
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["lastname"] for row in rows] == ["0", "1", "2"]
+
+    response = client.get("/contacts/export", params={"format": "csv"})
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.splitlines()[0] == "id,firstname,lastname,email,phone,birthday,avatar"
+    assert len(response.text.splitlines()) == 4
 
 def test_get_contact_by_id(client):
     data = {
@@ -75,7 +254,7 @@ def test_get_7_days_birthday_contact(client):
     # Create contacts with upcoming birthdays
     today = datetime.now()
     upcoming_birthdays = [
-        {"firstname": "Tom", "lastname": "Thumb", "email": "tom@example.com", "phone": "+3344556677", "birthday": (today + timedelta(days=i)).strftime("%Y-%m-%d")}
+        {"firstname": "Tom", "lastname": "Thumb", "email": f"tom{i}@example.com", "phone": f"+1415555268{i}", "birthday": (today + timedelta(days=i)).replace(year=1992).strftime("%Y-%m-%d")}
         for i in range(7)
     ]
     for contact in upcoming_birthdays:
@@ -85,6 +264,10 @@ def test_get_7_days_birthday_contact(client):
     assert response.status_code == 200
     assert len(response.json()) == 7
 
+    response = client.get("/contacts/show_birthday", params={"days": 2})
+    assert response.status_code == 200
+    assert [contact["email"] for contact in response.json()] == ["tom0@example.com", "tom1@example.com", "tom2@example.com"]
+
 def test_get_by_query(client):
     data = {
         "firstname": "Charlie",
@@ -99,6 +282,23 @@ def test_get_by_query(client):
     assert response.status_code == 200
     assert len(response.json()) > 0
 
+def test_get_by_query_prefix_and_substring(client):
+    client.post("/contacts", json={
+        "firstname": "Margaret",
+        "lastname": "Hamilton",
+        "email": "mhamilton@example.com",
+        "phone": "+14155552690",
+        "birthday": "1936-08-17"
+    })
+
+    for query in ("marg", "MILT", "hamilton@ex", "ma"):
+        response = client.get(f"/contacts/query/{query}")
+        assert response.status_code == 200
+        assert [contact["lastname"] for contact in response.json()] == ["Hamilton"]
+
+    response = client.get("/contacts/query/nobody")
+    assert response.json() == []
+
 def test_upload_image(client):
     # Create a contact to update avatar
     data = {
@@ -116,6 +316,16 @@ def test_upload_image(client):
     assert response.status_code == 200
     assert response.json()["ok"]
 
+def test_upload_image_for_missing_contact(client, monkeypatch):
+    import contacts.routes
+
+    def no_upload():
+        raise AssertionError("uploaded for a missing contact")
+
+    monkeypatch.setattr(contacts.routes, "get_cloudinary", no_upload)
+    response = client.post("/contacts/avatar?contact_id=999", files={"file": ("avatar.jpg", b"image")})
+    assert response.status_code == 404
+
 def test_clear_data(client):
     response = client.delete("/contacts/debug")
     assert response.status_code == 200
@@ -123,4 +333,94 @@ def test_clear_data(client):
 def test_fake_data_flud(client):
     response = client.post("/contacts/debug", params={"quantity": 5})
     assert response.status_code == 200
-    assert len(response.json()) == 6
+    assert len(response.json()) == 5
+
+def test_write_conflicts_and_patch(client):
+    first = {
+        "firstname": "Grace",
+        "lastname": "Hopper",
+        "email": "ghopper@example.com",
+        "phone": "+14155552697",
+        "birthday": "1906-12-09"
+    }
+    second = {**first, "email": "other@example.com", "phone": "+14155552698"}
+    created = client.post("/contacts", json=first).json()
+    assert created["id"] and created["email"] == "ghopper@example.com"
+    other_id = client.post("/contacts", json=second).json()["id"]
+
+    assert client.post("/contacts", json={**first, "phone": "+14155552699"}).status_code == 409
+    assert client.put(f"/contacts/{other_id}", json=first).status_code == 409
+    assert client.put("/contacts/999", json=first).status_code == 404
+
+    response = client.patch(f"/contacts/{created['id']}", json={"lastname": "Brewster"})
+    assert response.status_code == 200
+    assert response.json()["lastname"] == "Brewster"
+    assert response.json()["email"] == "ghopper@example.com"
+
+    assert client.patch(f"/contacts/{created['id']}", json={}).json()["lastname"] == "Brewster"
+    assert client.patch(f"/contacts/{created['id']}", json={"email": None}).status_code == 422
+    assert client.patch(f"/contacts/{other_id}", json={"email": "ghopper@example.com"}).status_code == 409
+    assert client.get(f"/contacts/{other_id}").json()["email"] == "other@example.com"
+
+def test_bulk_patch_and_delete(client):
+    client.post("/contacts/bulk", json=[
+        {"firstname": f"Bulk{i}", "lastname": "Old", "email": f"bulk{i}@{'acme' if i % 2 else 'other'}.com",
+         "phone": f"+1415555290{i}", "birthday": f"19{80 + i}-06-01"}
+        for i in range(6)
+    ])
+    acme = {"where": {"email_domain": "ACME.com"}}
+
+    response = client.patch("/contacts/bulk", json={**acme, "values": {"lastname": "New"}, "dry_run": True})
+    assert response.json() == {"rows": 3, "dry_run": True}
+    assert all(item["lastname"] == "Old" for item in client.get("/contacts").json()["items"])
+
+    response = client.patch("/contacts/bulk", json={**acme, "values": {"lastname": "New"}})
+    assert response.json() == {"rows": 3, "dry_run": False}
+    items = client.get("/contacts").json()["items"]
+    assert sorted(item["email"] for item in items if item["lastname"] == "New") == [
+        "bulk1@acme.com", "bulk3@acme.com", "bulk5@acme.com"
+    ]
+
+    ids = [item["id"] for item in items]
+    response = client.patch("/contacts/bulk", json={"where": {"ids": ids}, "values": {"phone": "+14155552999"}})
+    assert response.status_code == 409
+
+    window = {"where": {"ids": ids[:4] + [999], "birthday_from": "1981-01-01", "birthday_to": "1983-12-31"}}
+    response = client.request("DELETE", "/contacts/bulk", json=window)
+    assert response.json() == {"rows": 3, "dry_run": False}
+    assert len(client.get("/contacts").json()["items"]) == 3
+
+    assert client.request("DELETE", "/contacts/bulk", json={"where": {}}).status_code == 422
+    assert client.patch("/contacts/bulk", json={**acme, "values": {}}).status_code == 422
+
+def test_bulk_email_domain_is_not_a_pattern(client):
+    client.post("/contacts/bulk", json=[
+        {"firstname": "Wild", "lastname": str(i), "email": f"wild{i}@acme.com",
+         "phone": f"+1415555293{i}", "birthday": "1990-01-01"}
+        for i in range(2)
+    ])
+    for domain in ("@acme.com", ""):
+        response = client.request("DELETE", "/contacts/bulk", json={"where": {"email_domain": domain}})
+        assert response.status_code == 422
+
+    # LIKE wildcards are accepted and matched literally
+    for domain in ("%", "acme%", "_cme.com", "my_company.example"):
+        response = client.request("DELETE", "/contacts/bulk", json={"where": {"email_domain": domain}})
+        assert response.json() == {"rows": 0, "dry_run": False}
+    assert len(client.get("/contacts").json()["items"]) == 2
+
+def test_bulk_filters_walk_in_batches(client, monkeypatch):
+    import contacts.bulk
+    monkeypatch.setattr(contacts.bulk, "BATCH_SIZE", 2)
+    client.post("/contacts/bulk", json=[
+        {"firstname": "Batch", "lastname": str(i), "email": f"batch{i}@walk.com",
+         "phone": f"+1415555291{i}", "birthday": "1990-01-01"}
+        for i in range(5)
+    ])
+
+    response = client.patch("/contacts/bulk", json={"where": {"email_domain": "walk.com"}, "values": {"birthday": "1991-02-02"}})
+    assert response.json()["rows"] == 5
+    response = client.request("DELETE", "/contacts/bulk", json={"where": {"birthday_from": "1991-01-01"}})
+    assert response.json()["rows"] == 5
+    assert client.get("/contacts").json()["items"] == []
+    assert len(client.get("/contacts/changes").json()["changes"]) == 15